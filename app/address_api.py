@@ -1,15 +1,45 @@
-﻿import json
+﻿from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import json
+import os
 import re
+import socket
+import threading
+import time
+import urllib.error
 import urllib.parse
 import urllib.request
-from functools import lru_cache
 
+from .address_cache import AddressCache
 
-API_URL = "https://business.juso.go.kr/addrlink/addrLinkApi.do"
+API_URL = os.getenv("JUSO_API_URL") or "https://business.juso.go.kr/addrlink/addrLinkApi.do"
 
+MAX_IN_FLIGHT = 8
+RATE_PER_SEC = 10.0
+RETRIES = 2
+BACKOFF_SEC = 0.5
+BUDGET_SEC = 20.0
+BREAKER_THRESHOLD = 5
 
-@lru_cache(maxsize=2048)
-def _lookup(keyword, confm_key, timeout_sec):
+NO_RESULT = "검색 결과 없음"
+NO_ROAD_ADDR = "표준 도로명주소 없음"
+# Answers worth remembering; API error codes and exceptions are retried next run.
+NEGATIVE_ERRORS = {NO_RESULT, NO_ROAD_ADDR}
+SKIPPED_BUDGET = "주소 조회 시간 초과로 건너뜀"
+SKIPPED_BREAKER = "주소 API 연속 실패로 건너뜀"
+
+_memory_cache = None
+_memory_cache_lock = threading.Lock()
+
+
+def _default_cache():
+    global _memory_cache
+    with _memory_cache_lock:
+        if _memory_cache is None:
+            _memory_cache = AddressCache(":memory:")
+        return _memory_cache
+
+
+def _lookup(keyword, confm_key, timeout_sec, api_url=API_URL):
     params = {
         "currentPage": 1,
         "countPerPage": 5,
@@ -17,7 +47,7 @@ def _lookup(keyword, confm_key, timeout_sec):
         "confmKey": confm_key,
         "resultType": "json",
     }
-    url = f"{API_URL}?{urllib.parse.urlencode(params)}"
+    url = f"{api_url}?{urllib.parse.urlencode(params)}"
     req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
     with urllib.request.urlopen(req, timeout=timeout_sec) as resp:
         data = json.loads(resp.read().decode("utf-8", errors="replace"))
@@ -29,85 +59,347 @@ def _lookup(keyword, confm_key, timeout_sec):
 
     juso_list = results.get("juso", []) or []
     if not juso_list:
-        return None, "검색 결과 없음"
+        return None, NO_RESULT
 
     best = juso_list[0]
     road_addr = best.get("roadAddr", "").strip()
     if not road_addr:
-        return None, "표준 도로명주소 없음"
+        return None, NO_ROAD_ADDR
     return road_addr, None
 
 
-def _extract_detail_tokens(raw):
-    s = str(raw or "")
-    patterns = [
-        r"\d{1,4}동\s*\d{1,5}호",   # 101동2604호
-        r"\d{1,4}동",                # 101동
-        r"\d{1,5}호",                # 2604호
-        r"\d{1,2}층",                # 3층
-        r"\bB\d{1,2}\b",           # B1
-        r"\b[A-Za-z]-\d{3,5}\b",   # A-3501
-        r"\b\d{2,4}-\d{3,5}\b",   # 102-5909 (동-호 축약)
-    ]
-
-    tokens = []
-    for p in patterns:
-        for m in re.finditer(p, s, flags=re.IGNORECASE):
-            t = re.sub(r"\s+", "", m.group(0)).upper()
-            if t not in tokens:
-                tokens.append(t)
-
-    # Remove short tokens already covered by longer combined token.
-    filtered = []
-    for t in tokens:
-        covered = False
-        for other in tokens:
-            if t != other and t in other and (t.endswith("동") or t.endswith("호")):
-                covered = True
-                break
-        if not covered:
-            filtered.append(t)
-    return filtered
-
-
-def _merge_with_detail(road_addr, raw_addr):
-    details = _extract_detail_tokens(raw_addr)
-    if not details:
-        return road_addr
+# One alternation, tried left to right at each position: 101동2604호, 101동, 2604호,
+# 3층, B1, A-3501 and 102-5909 (동-호 축약). Hangul plus one or two digits plus 동
+# ending a word is an administrative dong name (우2동, 역삼1동), not a building.
+_ADMIN_DONG = r"(?<!\d)(?!(?<=[가-힣])\d{1,2}동(?![\w]))"
+_DETAIL_RE = re.compile(
+    rf"(?P<dong_ho>{_ADMIN_DONG}(?P<dong_ho_dong>\d{{1,4}})동\s*(?P<dong_ho_ho>\d{{1,5}})호)"
+    rf"|(?P<dong>{_ADMIN_DONG}(?P<dong_num>\d{{1,4}})동)"
+    r"|(?P<ho>(?P<ho_num>\d{1,5})호)"
+    r"|(?P<floor>(?P<floor_num>\d{1,2})층)"
+    r"|(?P<basement>\bB(?P<basement_num>\d{1,2})\b)"
+    r"|(?P<unit>\b(?P<unit_block>[A-Za-z])-(?P<unit_num>\d{3,5})\b)"
+    r"|(?P<dong_ho_short>\b(?P<short_dong>\d{2,4})-(?P<short_ho>\d{3,5})\b)",
+    re.IGNORECASE,
+)
+DETAIL_KINDS = ("dong_ho", "dong", "ho", "floor", "basement", "unit", "dong_ho_short")
+_KIND_RANK = {kind: i for i, kind in enumerate(DETAIL_KINDS)}
+_SPACE_RE = re.compile(r"\s+")
+# A 동/리/가 place name, or a road name, right before a number.
+_LOT_PREFIX_RE = re.compile(r"[가-힣\d](?:동|리|가|로|길)\s*$")
+
+
+def _is_detail(m):
+    # A bare 102-3602 right after a place name (우동 1408-123) is a lot number, and
+    # right after a road name it is the building number; anywhere else, e.g. after
+    # an apartment name or building number, it is a 동-호 pair.
+    return m.lastgroup != "dong_ho_short" or _LOT_PREFIX_RE.search(m.string, 0, m.start()) is None
+
+
+def normalize_address(addr):
+    s = str(addr or "").strip()
+    if not s:
+        return ""
+    s = re.sub(r"\s+", " ", s)
+    s = s.replace("부산시 ", "부산광역시 ")
+    s = s.replace("부산시", "부산광역시")
+    if re.match(r"^[가-힣]+구\b", s):
+        s = "부산광역시 " + s
+    return s
+
+
+def address_lookup_key(raw):
+    # The building-level part of an address: unit tokens (동/호/층 ...) removed and
+    # spacing and 부산시 variants normalized, so every flat in one building shares a key.
+    s = _DETAIL_RE.sub(lambda m: " " if _is_detail(m) else m.group(0), str(raw or ""))
+    s = re.sub(r"\(\s*\)", " ", s)
+    s = re.sub(r"\s*,\s*", ", ", s)
+    s = re.sub(r"[\s,]+$", "", s.strip())
+    s = re.sub(r"^[\s,]+", "", s)
+    return normalize_address(s) or normalize_address(raw)
 
-    merged_details = []
-    road_norm = re.sub(r"\s+", "", str(road_addr or "")).upper()
-    for d in details:
-        if d not in road_norm and d not in merged_details:
-            merged_details.append(d)
 
+def extract_detail_parts(raw):
+    # Unit-level details found in one scan, e.g. {"kind": "dong_ho", "dong": "101",
+    # "ho": "2604", "text": "101동2604호"}. Parts come out grouped by kind in
+    # DETAIL_KINDS order; a bare 동 or 호 already part of a 동+호 pair is dropped.
+    parts = []
+    seen = set()
+    for m in _DETAIL_RE.finditer(str(raw or "")):
+        if not _is_detail(m):
+            continue
+        # The kind groups enclose their number groups, so they always close last.
+        kind = m.lastgroup
+        text = _SPACE_RE.sub("", m.group(kind)).upper()
+        if text in seen:
+            continue
+        seen.add(text)
+        part = {"kind": kind, "text": text, "pos": m.start()}
+        if kind == "dong_ho":
+            part["dong"], part["ho"] = m.group("dong_ho_dong"), m.group("dong_ho_ho")
+        elif kind == "dong_ho_short":
+            part["dong"], part["ho"] = m.group("short_dong"), m.group("short_ho")
+        elif kind == "dong":
+            part["dong"] = m.group("dong_num")
+        elif kind == "ho":
+            part["ho"] = m.group("ho_num")
+        elif kind == "floor":
+            part["floor"] = m.group("floor_num")
+        elif kind == "basement":
+            part["floor"] = "B" + m.group("basement_num")
+        else:
+            part["dong"], part["ho"] = m.group("unit_block").upper(), m.group("unit_num")
+        parts.append(part)
+
+    pairs = [p for p in parts if p["kind"] == "dong_ho"]
+    if pairs:
+        dongs = {p["dong"] for p in pairs}
+        hos = {p["ho"] for p in pairs}
+        parts = [
+            p
+            for p in parts
+            if not (p["kind"] == "dong" and p["dong"] in dongs) and not (p["kind"] == "ho" and p["ho"] in hos)
+        ]
+    parts.sort(key=lambda p: (_KIND_RANK[p["kind"]], p["pos"]))
+    return parts
+
+
+def _merge_with_detail(road_addr, raw_addr, parts=None):
+    if parts is None:
+        parts = extract_detail_parts(raw_addr)
+    if not parts:
+        return road_addr
+
+    road_norm = _SPACE_RE.sub("", str(road_addr or "")).upper()
+    merged_details = [p["text"] for p in parts if p["text"] not in road_norm]
     if not merged_details:
         return road_addr
     return f"{road_addr}, {' '.join(merged_details)}"
 
 
-def resolve_addresses(records, confm_key, timeout_sec=3):
-    if not confm_key:
-        return 0, 0, []
+class _TokenBucket:
+    # At most `rate` calls per second on average, with bursts of up to `burst`.
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
 
-    success = 0
-    failed = 0
-    issues = []
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class _CircuitBreaker:
+    # Opens after `threshold` consecutive transient failures and stays open for the
+    # rest of the batch; any answer from the API resets the count.
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.failures = 0
+        self.is_open = False
+        self.lock = threading.Lock()
 
+    def record_success(self):
+        with self.lock:
+            if not self.is_open:
+                self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.threshold and self.failures >= self.threshold:
+                self.is_open = True
+
+
+class _Skipped(Exception):
+    pass
+
+
+def _is_transient(exc):
+    if isinstance(exc, urllib.error.HTTPError):
+        return exc.code == 429 or exc.code >= 500
+    return isinstance(exc, (urllib.error.URLError, socket.timeout, TimeoutError, ConnectionError))
+
+
+def _lookup_with_retry(
+    keyword, confm_key, timeout_sec, api_url, bucket, retries, backoff_sec, breaker=None, deadline=None
+):
+    # Timeouts, connection errors, 429 and 5xx are retried with exponential backoff;
+    # anything else (and the last failure) is raised to the caller. No attempt starts
+    # once the breaker is open or the deadline has passed, and the request timeout is
+    # cut down to whatever is left of the budget.
+    attempt = 0
+    while True:
+        if bucket:
+            bucket.acquire()
+        if breaker and breaker.is_open:
+            raise _Skipped(SKIPPED_BREAKER)
+        timeout = timeout_sec
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.monotonic())
+            if timeout <= 0:
+                raise _Skipped(SKIPPED_BUDGET)
+        try:
+            result = _lookup(keyword, confm_key, timeout, api_url)
+        except Exception as e:
+            transient = _is_transient(e)
+            if breaker and transient:
+                breaker.record_failure()
+            if attempt >= retries or not transient:
+                raise
+            pause = backoff_sec * (2 ** attempt)
+            if deadline is not None:
+                pause = min(pause, max(0.0, deadline - time.monotonic()))
+            time.sleep(pause)
+            attempt += 1
+        else:
+            if breaker:
+                breaker.record_success()
+            return result
+
+
+def resolve_addresses(
+    records,
+    confm_key,
+    timeout_sec=3,
+    max_in_flight=MAX_IN_FLIGHT,
+    rate_per_sec=RATE_PER_SEC,
+    retries=RETRIES,
+    backoff_sec=BACKOFF_SEC,
+    api_url=None,
+    cache=None,
+    index=None,
+    budget_sec=BUDGET_SEC,
+    breaker_threshold=BREAKER_THRESHOLD,
+):
+    # Returns (success, failed, issues, stats); stats counts cache hits and misses,
+    # offline index hits and how many distinct lookup keys the records collapsed to.
+    # With an offline index (address_index.AddressIndex) keys are matched locally
+    # first and only the misses go to the API, if a key is given at all.
+    # API lookups share one time budget and a circuit breaker. When either runs out
+    # the call returns at once; the keys not looked up yet are reported as skipped
+    # and their records keep address_api unset, so the builders fall back to
+    # normalize_address. stats["breaker"] is "closed" or "open".
+    stats = {
+        "cache_hits": 0,
+        "cache_misses": 0,
+        "lookup_keys": 0,
+        "offline_hits": 0,
+        "skipped": 0,
+        "budget_exceeded": False,
+        "breaker": "closed",
+        "consecutive_failures": 0,
+    }
+    if not confm_key and index is None:
+        return 0, 0, [], stats
+
+    cache = cache or _default_cache()
+    targets = []
+    outcomes = {}
     for rec in records:
-        raw = str(rec.get("address_raw", rec.get("address", "")) or "").strip()
+        raw = str(rec.address_raw or "").strip()
         if not raw:
             continue
+        key = address_lookup_key(raw)
+        targets.append((rec, raw, key))
+        if key in outcomes:
+            continue
+        if index is not None:
+            road_addr, err = index.lookup(key)
+            if road_addr or not confm_key:
+                stats["offline_hits"] += bool(road_addr)
+                outcomes[key] = (road_addr, err, None)
+                continue
+        hit, road_addr, err = cache.get(key)
+        if hit:
+            stats["cache_hits"] += 1
+            outcomes[key] = (road_addr, err, None)
+        else:
+            stats["cache_misses"] += 1
+            outcomes[key] = None
+    if not targets:
+        return 0, 0, [], stats
+    stats["lookup_keys"] = len(outcomes)
+    pending = [key for key, outcome in outcomes.items() if outcome is None]
+
+    bucket = _TokenBucket(rate_per_sec) if rate_per_sec else None
+    breaker = _CircuitBreaker(breaker_threshold)
+    deadline = time.monotonic() + budget_sec if budget_sec else None
+    # Read per call so JUSO_API_URL can point at a stand-in server (tests/conftest.py).
+    url = api_url or os.getenv("JUSO_API_URL") or API_URL
+
+    def work(key):
         try:
-            road_addr, err = _lookup(raw, confm_key, int(timeout_sec))
-            if road_addr:
-                rec["address_api"] = _merge_with_detail(road_addr, raw)
-                success += 1
-            else:
-                failed += 1
-                issues.append({"name": rec.get("name", ""), "address": raw, "issue": err or "조회 실패"})
+            road_addr, err = _lookup_with_retry(
+                key, confm_key, timeout_sec, url, bucket, retries, backoff_sec, breaker, deadline
+            )
+            return road_addr, err, None
+        except _Skipped as e:
+            return None, str(e), None
         except Exception as e:
+            return None, None, e
+
+    # The pool size is the number of requests in flight. Requests still running when
+    # the budget ends or the breaker opens are left to finish in the background.
+    if pending:
+        workers = max(1, min(int(max_in_flight or 1), len(pending)))
+        pool = ThreadPoolExecutor(max_workers=workers)
+        futures = {pool.submit(work, key): key for key in pending}
+        not_done = set(futures)
+        try:
+            while not_done and not breaker.is_open:
+                timeout = None
+                if deadline is not None:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        stats["budget_exceeded"] = True
+                        break
+                # Short waits so an open breaker is noticed while requests are still retrying.
+                done, not_done = wait(not_done, timeout=min(timeout or 0.2, 0.2), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    key = futures[fut]
+                    outcomes[key] = fut.result()
+                    road_addr, err, exc = outcomes[key]
+                    if exc is None and (road_addr or err in NEGATIVE_ERRORS):
+                        cache.put(key, road_addr, err)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        reason = SKIPPED_BREAKER if breaker.is_open else SKIPPED_BUDGET
+        for fut in not_done:
+            outcomes[futures[fut]] = (None, reason, None)
+        for key in pending:
+            if outcomes[key][1] in (SKIPPED_BREAKER, SKIPPED_BUDGET):
+                stats["skipped"] += 1
+        stats["breaker"] = "open" if breaker.is_open else "closed"
+        stats["consecutive_failures"] = breaker.failures
+        stats["budget_exceeded"] = stats["budget_exceeded"] or any(
+            outcomes[key][1] == SKIPPED_BUDGET for key in pending
+        )
+
+    success = 0
+    failed = 0
+    issues = []
+
+    # One answer per key, fanned back out with each student's own 동/호 details.
+    for rec, raw, key in targets:
+        road_addr, err, exc = outcomes[key]
+        if road_addr:
+            rec.address_api = _merge_with_detail(road_addr, raw)
+            success += 1
+        elif exc is not None:
+            failed += 1
+            issues.append({"name": rec.name, "address": raw, "issue": f"API 예외: {exc}"})
+        else:
             failed += 1
-            issues.append({"name": rec.get("name", ""), "address": raw, "issue": f"API 예외: {e}"})
+            issues.append({"name": rec.name, "address": raw, "issue": err or "조회 실패"})
 
-    return success, failed, issues
\ No newline at end of file
+    return success, failed, issues, stats
@@ -0,0 +1,99 @@
+﻿import re
+import sqlite3
+import threading
+import time
+
+
+POSITIVE_TTL_SEC = 180 * 24 * 3600
+NEGATIVE_TTL_SEC = 7 * 24 * 3600
+MAX_ENTRIES = 50000
+
+
+def cache_key(keyword):
+    return re.sub(r"\s+", " ", str(keyword or "")).strip()
+
+
+class AddressCache:
+    # keyword -> (road address, error) kept in SQLite so lookups survive restarts.
+    # Answers are dropped after their TTL (negative answers expire sooner) and the
+    # least recently used rows are evicted once the table grows past max_entries.
+    # Pass ":memory:" for a cache that only lives as long as the process.
+    def __init__(
+        self,
+        path,
+        positive_ttl=POSITIVE_TTL_SEC,
+        negative_ttl=NEGATIVE_TTL_SEC,
+        max_entries=MAX_ENTRIES,
+    ):
+        self.path = path
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS addresses ("
+            "key TEXT PRIMARY KEY, road_addr TEXT, error TEXT, stored_at REAL, used_at REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS addresses_used_at ON addresses (used_at)")
+        self.conn.commit()
+        self.size = self.conn.execute("SELECT COUNT(*) FROM addresses").fetchone()[0]
+
+    def get(self, keyword):
+        # (True, road_addr, error) on a fresh hit, (False, None, None) otherwise.
+        key = cache_key(keyword)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT road_addr, error, stored_at FROM addresses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                road_addr, error, stored_at = row
+                ttl = self.positive_ttl if road_addr else self.negative_ttl
+                if now - stored_at <= ttl:
+                    self.conn.execute("UPDATE addresses SET used_at = ? WHERE key = ?", (now, key))
+                    self.conn.commit()
+                    self.stats["hits"] += 1
+                    return True, road_addr, error
+                self.conn.execute("DELETE FROM addresses WHERE key = ?", (key,))
+                self.conn.commit()
+                self.size -= 1
+            self.stats["misses"] += 1
+            return False, None, None
+
+    def put(self, keyword, road_addr, error=None):
+        key = cache_key(keyword)
+        now = time.time()
+        with self.lock:
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO addresses (key, road_addr, error, stored_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (key, road_addr, error, now, now),
+            )
+            if cur.rowcount:
+                self.size += 1
+            else:
+                self.conn.execute(
+                    "UPDATE addresses SET road_addr = ?, error = ?, stored_at = ?, used_at = ? WHERE key = ?",
+                    (road_addr, error, now, now, key),
+                )
+            self.stats["stores"] += 1
+            if self.size > self.max_entries:
+                self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        # Trim to 90% of max_entries so eviction does not run on every insert.
+        excess = self.size - int(self.max_entries * 0.9)
+        self.conn.execute(
+            "DELETE FROM addresses WHERE key IN (SELECT key FROM addresses ORDER BY used_at LIMIT ?)",
+            (excess,),
+        )
+        self.size -= excess
+        self.stats["evictions"] += excess
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,271 @@
+﻿import argparse
+import bisect
+import io
+import mmap
+import os
+import re
+import struct
+import threading
+import zipfile
+
+from .address_api import address_lookup_key
+
+
+# Column positions (0-based) in the pipe-delimited 도로명주소 한글 전체분 text files
+# (rnaddrkor_*.txt, cp949) distributed by juso.go.kr.
+JUSO_DB_COLUMNS = {
+    "sido": 2,
+    "sigungu": 3,
+    "dong": 4,
+    "ri": 5,
+    "san": 6,
+    "jibun_main": 7,
+    "jibun_sub": 8,
+    "road": 10,
+    "underground": 11,
+    "building_main": 12,
+    "building_sub": 13,
+    "apartment": 19,
+    "building_name": 21,
+    "sigungu_building_name": 22,
+}
+
+ADDRESS_BACKENDS = ("juso", "offline", "hybrid")
+
+MAGIC = b"ADDRIDX1"
+_HEADER = struct.Struct("<8sQ")
+_OFFSET = struct.Struct("<Q")
+
+_DISTRICT_RE = re.compile(r"([가-힣]+(?:구|군))(?=\s|$)")
+_ROAD_RE = re.compile(r"([가-힣A-Za-z0-9·]+(?:로|길))\s*(지하\s*)?(\d+)(?:\s*-\s*(\d+))?")
+_JIBUN_RE = re.compile(r"([가-힣0-9]+(?:동|가|리))\s*(산\s*)?(\d+)(?:\s*-\s*(\d+))?")
+_NAME_RE = re.compile(r"[가-힣A-Za-z0-9]{2,}")
+
+
+def _compact(s):
+    return re.sub(r"\s+", "", str(s or "")).upper()
+
+
+def _number(main, sub):
+    main = str(main or "").strip()
+    sub = str(sub or "").strip()
+    return f"{main}-{sub}" if sub and sub != "0" else main
+
+
+def _district(sigungu):
+    # "창원시 의창구" -> "의창구"; the survey usually only names the last level.
+    parts = str(sigungu or "").split()
+    return parts[-1] if parts else ""
+
+
+def _road_address(row):
+    number = _number(row["building_main"], row["building_sub"])
+    if row["underground"] == "1":
+        number = f"지하 {number}"
+    addr = " ".join(p for p in (row["sido"], row["sigungu"], row["road"], number) if p)
+    notes = [row["dong"]] if row["dong"] and not row["ri"] else []
+    name = row["sigungu_building_name"] or row["building_name"]
+    if name and row["apartment"] == "1":
+        notes.append(name)
+    return f"{addr} ({', '.join(notes)})" if notes else addr
+
+
+def _row_keys(row):
+    district = _district(row["sigungu"])
+    road = _number(row["building_main"], row["building_sub"])
+    yield f"R|{district}|{_compact(row['road'])}|{road}"
+    yield f"R||{_compact(row['road'])}|{road}"
+    if row["jibun_main"] and row["jibun_main"] != "0":
+        place = _compact(row["ri"] or row["dong"])
+        jibun = ("산" if row["san"] == "1" else "") + _number(row["jibun_main"], row["jibun_sub"])
+        yield f"J|{district}|{place}|{jibun}"
+        yield f"J||{place}|{jibun}"
+    for name in {row["building_name"], row["sigungu_building_name"]}:
+        if name:
+            yield f"B|{district}|{_compact(name)}"
+            yield f"B||{_compact(name)}"
+
+
+def iter_juso_db_rows(paths, encoding="cp949", columns=None):
+    # Text files or the zip archives they are distributed in.
+    columns = columns or JUSO_DB_COLUMNS
+    width = max(columns.values()) + 1
+    for path in paths:
+        if zipfile.is_zipfile(path):
+            with zipfile.ZipFile(path) as zf:
+                for member in zf.namelist():
+                    if member.lower().endswith(".txt"):
+                        with zf.open(member) as fh:
+                            yield from _parse_lines(io.TextIOWrapper(fh, encoding=encoding, errors="replace"), columns, width)
+        else:
+            with open(path, encoding=encoding, errors="replace") as fh:
+                yield from _parse_lines(fh, columns, width)
+
+
+def _parse_lines(lines, columns, width):
+    for line in lines:
+        parts = line.rstrip("\r\n").split("|")
+        if len(parts) < width:
+            continue
+        yield {name: parts[pos].strip() for name, pos in columns.items()}
+
+
+def build_address_index(rows, out_path):
+    # Every lookup key of every building, sorted by UTF-8 bytes and written as
+    # "key\0road address\n" records after a table of record offsets. Keys shared by
+    # different buildings (e.g. the same road name in two districts) are dropped.
+    entries = {}
+    for row in rows:
+        value = _road_address(row)
+        for key in _row_keys(row):
+            if entries.setdefault(key, value) != value:
+                entries[key] = None
+    items = sorted((k.encode("utf-8"), v.encode("utf-8")) for k, v in entries.items() if v is not None)
+
+    tmp = out_path + ".tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(_HEADER.pack(MAGIC, len(items)))
+        offset = 0
+        for key, value in items:
+            fh.write(_OFFSET.pack(offset))
+            offset += len(key) + len(value) + 2
+        for key, value in items:
+            fh.write(key + b"\0" + value + b"\n")
+    os.replace(tmp, out_path)
+    return len(items)
+
+
+class AddressIndex:
+    # Read-only view over a file written by build_address_index. The file is memory
+    # mapped, so opening is instant and the pages are shared between processes.
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = _HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"주소 색인 파일 형식이 아닙니다: {path}")
+        self.data_start = _HEADER.size + self.count * _OFFSET.size
+
+    def __len__(self):
+        return self.count
+
+    def _record(self, i):
+        start = self.data_start + _OFFSET.unpack_from(self.map, _HEADER.size + i * _OFFSET.size)[0]
+        sep = self.map.find(b"\0", start)
+        return start, sep
+
+    def _key_at(self, i):
+        start, sep = self._record(i)
+        return self.map[start:sep]
+
+    def get(self, key):
+        needle = key.encode("utf-8")
+        keys = _KeyView(self)
+        i = bisect.bisect_left(keys, needle)
+        if i < self.count and keys[i] == needle:
+            _, sep = self._record(i)
+            end = self.map.find(b"\n", sep)
+            return self.map[sep + 1 : end].decode("utf-8")
+        return None
+
+    def lookup(self, raw):
+        # (road address, None) on a match, (None, reason) otherwise, like _lookup.
+        for key in match_keys(raw):
+            value = self.get(key)
+            if value:
+                return value, None
+        return None, "오프라인 색인에 없음"
+
+    def close(self):
+        if getattr(self, "map", None) is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+
+class _KeyView:
+    # Sequence of the index keys for bisect, read straight from the mapping.
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return self.index.count
+
+    def __getitem__(self, i):
+        return self.index._key_at(i)
+
+
+def match_keys(raw):
+    # Candidate index keys for a survey address, most specific first.
+    text = address_lookup_key(raw)
+    m = _DISTRICT_RE.search(text)
+    district = m.group(1) if m else ""
+    keys = []
+
+    m = _ROAD_RE.search(text)
+    if m:
+        road = f"{_compact(m.group(1))}|{_number(m.group(3), m.group(4))}"
+        if district:
+            keys.append(f"R|{district}|{road}")
+        keys.append(f"R||{road}")
+
+    m = _JIBUN_RE.search(text)
+    if m and m.group(1) != district:
+        jibun = f"{_compact(m.group(1))}|{'산' if m.group(2) else ''}{_number(m.group(3), m.group(4))}"
+        if district:
+            keys.append(f"J|{district}|{jibun}")
+        keys.append(f"J||{jibun}")
+
+    for name in _NAME_RE.findall(text):
+        if name == district or name.endswith(("시", "도")) or name.isdigit():
+            continue
+        if district:
+            keys.append(f"B|{district}|{_compact(name)}")
+        keys.append(f"B||{_compact(name)}")
+    return keys
+
+
+_open_indexes = {}
+_open_lock = threading.Lock()
+
+
+def open_address_index(path):
+    # One mapping per path per process.
+    with _open_lock:
+        index = _open_indexes.get(path)
+        if index is None:
+            index = _open_indexes[path] = AddressIndex(path)
+        return index
+
+
+def select_backend(backend, juso_key, index_path):
+    # "juso": API only, "offline": local index only, "hybrid": index first, API for misses.
+    # Returns the (juso_key, index) pair to hand to resolve_addresses.
+    backend = (backend or "juso").strip().lower()
+    if backend not in ADDRESS_BACKENDS:
+        raise ValueError(f"알 수 없는 주소 백엔드입니다: {backend}")
+    index = None
+    if backend != "juso" and index_path and os.path.exists(index_path):
+        index = open_address_index(index_path)
+    return (juso_key if backend != "offline" else ""), index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="도로명주소 DB 파일로 오프라인 주소 색인을 만듭니다.")
+    parser.add_argument("sources", nargs="+", help="rnaddrkor_*.txt 또는 이를 담은 zip 파일")
+    parser.add_argument("-o", "--output", required=True, help="만들 색인 파일 경로")
+    parser.add_argument("--sido", help="이 시도만 색인 (예: 부산광역시)")
+    parser.add_argument("--encoding", default="cp949")
+    args = parser.parse_args(argv)
+
+    rows = iter_juso_db_rows(args.sources, encoding=args.encoding)
+    if args.sido:
+        rows = (r for r in rows if r["sido"] == args.sido)
+    count = build_address_index(rows, args.output)
+    print(f"{args.output}: {count}개 키")
+
+
+if __name__ == "__main__":
+    main()
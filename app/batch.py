@@ -0,0 +1,183 @@
+﻿from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import os
+import time
+import zipfile
+
+import openpyxl
+
+from .address_api import resolve_addresses
+from .address_cache import AddressCache
+from .address_index import select_backend
+from .columnar import build_cube
+from .mapper import FIELD_TOKENS, iter_student_records
+from .timing import StageTimer, span
+from .validator import build_validation_frame
+from .builders import build_boarding_report, build_dropoff_result, build_student_roster
+
+
+def _is_student_sheet(headers):
+    return any(FIELD_TOKENS["name"] in str(h or "") for h in headers)
+
+
+def read_class_sheets(source, label=None):
+    # One class per sheet: every sheet whose header row carries 학생이름 is taken.
+    # Rows are materialized as plain tuples so they can be shipped to worker processes.
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        out = []
+        for ws in wb.worksheets:
+            rows = ws.iter_rows(values_only=True)
+            headers = next(rows, None)
+            if not headers or not _is_student_sheet(headers):
+                continue
+            name = ws.title
+            if label and (name == "학생" or len(wb.sheetnames) == 1):
+                name = label
+            out.append((name, [tuple(headers)] + [tuple(r) for r in rows]))
+        return out
+    finally:
+        wb.close()
+
+
+def convert_class(
+    class_name,
+    rows,
+    school_year,
+    roster_template_path=None,
+    dropoff_template_path=None,
+    juso_key="",
+    plan_dir=None,
+    address_cache_path=None,
+    address_backend="juso",
+    address_index_path=None,
+):
+    started = time.perf_counter()
+    timer = StageTimer(phase="batch", **{"class": class_name})
+    try:
+        with timer.activate():
+            errors = []
+            with span("records"):
+                records = list(iter_student_records(rows, errors, plan_dir=plan_dir))
+            if not records:
+                return {"class": class_name, "student_count": 0, "error": "학생 데이터를 읽지 못했습니다."}
+
+            api_ok = 0
+            api_fail = 0
+            api_stats = {}
+            juso_key, index = select_backend(address_backend, juso_key, address_index_path)
+            if juso_key or index:
+                cache = AddressCache(address_cache_path) if address_cache_path else None
+                try:
+                    with span("addresses"):
+                        api_ok, api_fail, _, api_stats = resolve_addresses(
+                            records, juso_key, timeout_sec=3, cache=cache, index=index
+                        )
+                finally:
+                    if cache:
+                        cache.close()
+
+            with span("cube"):
+                cube = build_cube(records)
+            with span("roster"):
+                out1 = build_student_roster(
+                    records, school_year=school_year, default_template_path=roster_template_path, errors=errors
+                )
+            with span("dropoff"):
+                out2 = build_dropoff_result(records, default_template_path=dropoff_template_path, cube=cube)
+            with span("boarding"):
+                out3 = build_boarding_report(records, cube=cube)
+        return {
+            "class": class_name,
+            "student_count": len(records),
+            "errors": errors,
+            "out1": out1,
+            "out2": out2,
+            "out3": out3,
+            "api_ok": api_ok,
+            "api_fail": api_fail,
+            "cache_hits": api_stats.get("cache_hits", 0),
+            "cache_misses": api_stats.get("cache_misses", 0),
+            "breaker": api_stats.get("breaker", ""),
+            "address_skipped": api_stats.get("skipped", 0),
+            "elapsed": time.perf_counter() - started,
+            "timings": timer.rows(),
+        }
+    except Exception as e:
+        return {"class": class_name, "student_count": 0, "error": f"{type(e).__name__}: {e}"}
+
+
+def convert_workbook(source, school_year, label=None, **options):
+    # Every class sheet of one survey workbook, converted in this process.
+    return [convert_class(name, rows, school_year, **options) for name, rows in read_class_sheets(source, label)]
+
+
+def convert_classes(class_sheets, school_year, max_workers=None, **options):
+    # class_sheets: [(class_name, rows), ...] as returned by read_class_sheets.
+    if not class_sheets:
+        return []
+
+    workers = max_workers or min(len(class_sheets), os.cpu_count() or 1)
+    if workers <= 1:
+        return [convert_class(name, rows, school_year, **options) for name, rows in class_sheets]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(convert_class, name, rows, school_year, **options) for name, rows in class_sheets]
+        return [fut.result() for fut in futures]
+
+
+def unique_labels(labels):
+    # Repeated labels get " (2)", " (3)" ... in order, so no two outputs share a
+    # folder. A suffix never takes a label that appears as is elsewhere in the list.
+    given = {label.casefold() for label in labels}
+    used = set()
+    out = []
+    for label in labels:
+        unique = label
+        n = 1
+        while unique.casefold() in used or (n > 1 and unique.casefold() in given):
+            n += 1
+            unique = f"{label} ({n})"
+        used.add(unique.casefold())
+        out.append(unique)
+    return out
+
+
+def output_files(res, school_year, folder=None):
+    # (path inside the bundle, bytes) for one converted class; folder defaults to
+    # res["folder"] (set per uploaded file) or the class name.
+    name = res["class"]
+    folder = folder or res.get("folder") or name
+    return [
+        (f"{folder}/{school_year}학년도_{name}_학생일람표_자동생성.xlsx", res["out1"]),
+        (f"{folder}/{school_year}학년도_{name}_하교차량조사결과_자동생성.xlsx", res["out2"]),
+        (f"{folder}/{school_year}학년도_{name}_등교차량조사_개선형.xlsx", res["out3"]),
+    ]
+
+
+def validation_log(results):
+    # All classes' warnings as one CSV, or None when there are none.
+    errors = []
+    for res in results:
+        for e in res.get("errors", []):
+            errors.append({**e, "name": f"[{res['class']}] {e.get('name', '')}"})
+    if not errors:
+        return None
+    return build_validation_frame(errors).to_csv(index=False).encode("utf-8-sig")
+
+
+def bundle_to_zip(results, school_year):
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        done = [res for res in results if not res.get("error")]
+        folders = unique_labels([res.get("folder") or res["class"] for res in done])
+        for res, folder in zip(done, folders):
+            for path, data in output_files(res, school_year, folder):
+                zf.writestr(path, data)
+
+        log = validation_log(results)
+        if log:
+            zf.writestr("검증로그.csv", log)
+    return buf.getvalue()
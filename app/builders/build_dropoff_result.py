@@ -1,11 +1,17 @@
-﻿from io import BytesIO
+﻿from copy import copy
+from io import BytesIO
 import os
 
 import openpyxl
-from openpyxl.styles import PatternFill, Border, Side
+from openpyxl.styles import NamedStyle, PatternFill, Border, Side
+from openpyxl.styles.fonts import DEFAULT_FONT
 
+from app.columnar import build_cube, dropoff_summary, dropoff_wide_rows
 from app.mapper import WEEKDAYS, make_student_id
 
+from .sheet_writer import add_sheet, column_styles, new_workbook, register_styles, save_workbook, styled
+from .template_cache import get_compiled
+
 
 DAY_COLS = {
     "월요일": (4, 5, 6, 7),
@@ -15,6 +21,23 @@ DAY_COLS = {
     "금요일": (20, 21, 22, 23),
 }
 
+DAY_FILLS = {
+    "월요일": PatternFill(fill_type="solid", fgColor="00FFF2CC"),
+    "화요일": PatternFill(fill_type="solid", fgColor="00E2F0D9"),
+    "수요일": PatternFill(fill_type="solid", fgColor="00D9E1F2"),
+    "목요일": PatternFill(fill_type="solid", fgColor="00FCE4D6"),
+    "금요일": PatternFill(fill_type="solid", fgColor="00E4DFEC"),
+}
+
+COLUMN_WIDTHS = {
+    1: 8, 2: 8, 3: 12,
+    4: 14, 5: 12, 6: 12, 7: 20,
+    8: 14, 9: 12, 10: 12, 11: 20,
+    12: 14, 13: 12, 14: 12, 15: 20,
+    16: 14, 17: 12, 18: 12, 19: 20,
+    20: 14, 21: 12, 22: 12, 23: 20,
+}
+
 HEADERS = [
     "학반",
     "학번",
@@ -51,104 +74,113 @@ def _to_int(v):
     return int(s)
 
 
-def _read_roster_order_from_template(template_bytes=None, default_template_path=None):
-    if not template_bytes and not default_template_path:
-        return []
-
+def _compile_roster_order(template_bytes, default_template_path):
     if template_bytes:
-        wb = openpyxl.load_workbook(BytesIO(template_bytes))
+        wb = openpyxl.load_workbook(BytesIO(template_bytes), read_only=True)
     else:
         if not default_template_path or not os.path.exists(default_template_path):
             return []
-        wb = openpyxl.load_workbook(default_template_path)
+        wb = openpyxl.load_workbook(default_template_path, read_only=True)
+
+    try:
+        if "명단" not in wb.sheetnames:
+            return []
+
+        rows = []
+        for values in wb["명단"].iter_rows(min_row=3, max_col=2, values_only=True):
+            values = tuple(values) + (None,) * (2 - len(values))
+            number = _to_int(values[0])
+            name = str(values[1] or "").strip()
+            if number is None and not name:
+                continue
+            rows.append((number, name))
+        return rows
+    finally:
+        wb.close()
 
-    if "명단" not in wb.sheetnames:
+
+def _read_roster_order_from_template(template_bytes=None, default_template_path=None):
+    if not template_bytes and not default_template_path:
         return []
+    return list(get_compiled("dropoff_roster_order", template_bytes, default_template_path, _compile_roster_order))
 
-    ws = wb["명단"]
-    rows = []
-    for rr in range(3, ws.max_row + 1):
-        number = _to_int(ws.cell(rr, 1).value)
-        name = str(ws.cell(rr, 2).value or "").strip()
-        if number is None and not name:
-            continue
-        rows.append((number, name))
-    return rows
 
+def _dropoff_styles():
+    thin = Side(style="thin", color="000000")
+    grid = Border(left=thin, right=thin, top=thin, bottom=thin)
+    styles = [NamedStyle(name="dropoff_grid", font=copy(DEFAULT_FONT), border=grid)]
+    for day, fill in DAY_FILLS.items():
+        styles.append(NamedStyle(name=f"dropoff_{day}", font=copy(DEFAULT_FONT), border=grid, fill=fill))
+    return styles
+
+
+def _default_roster_order(dropoff):
+    students = dropoff.loc[dropoff["day"] == WEEKDAYS[0], ["number", "name"]].copy()
+    students["key"] = students["number"].map(lambda n: n or 9999)
+    students = students.sort_values(["key", "name"], kind="stable")
+    return list(zip(students["number"], students["name"]))
+
+
+def _write_day_summary(wb, cube, day):
+    table = dropoff_summary(cube, day)
+    vehicles = list(table.columns)
+
+    widths = {1: 10, 2: 26}
+    widths.update({c: 12 for c in range(3, len(vehicles) + 4)})
+    ws = add_sheet(wb, f"{day}_하교요약", widths)
+
+    ws.append(["하교시간", "하차장소"] + vehicles + ["합계"])
+    for (slot, location), counts in zip(table.index, table.to_numpy().tolist()):
+        ws.append([f"{slot}하교" if slot else "미정", location] + counts + [sum(counts)])
 
-def build_dropoff_result(records, template_bytes=None, default_template_path=None):
-    rec_by_number = {r.get("number"): r for r in records if r.get("number") is not None}
-    rec_by_name = {r.get("name"): r for r in records}
 
-    grade_num = records[0].get("grade_num") if records else 0
-    class_num = records[0].get("class_num") if records else 0
+def build_dropoff_result(records, template_bytes=None, default_template_path=None, cube=None, write_only=True):
+    if cube is None:
+        cube = build_cube(records)
+    dropoff = cube["dropoff"]
+    values_by_pos = dropoff_wide_rows(dropoff)
+    pos_by_number = {r.number: pos for pos, r in enumerate(records) if r.number is not None}
+    pos_by_name = {r.name: pos for pos, r in enumerate(records)}
+
+    grade_num = records[0].grade_num if records else 0
+    class_num = records[0].class_num if records else 0
     class_code = f"{grade_num}{class_num}" if grade_num and class_num else ""
 
     roster_rows = _read_roster_order_from_template(template_bytes, default_template_path)
     if not roster_rows:
-        roster_rows = sorted([(r.get("number"), r.get("name", "")) for r in records], key=lambda x: (x[0] or 9999, x[1]))
+        roster_rows = _default_roster_order(dropoff)
+
+    wb = new_workbook(write_only)
+    ws_result = add_sheet(wb, "하교차량조사결과", COLUMN_WIDTHS)
 
-    wb = openpyxl.Workbook()
-    ws_result = wb.active
-    ws_result.title = "하교차량조사결과"
+    register_styles(wb, _dropoff_styles())
+    col_styles = column_styles(
+        len(HEADERS),
+        [(cols[0], cols[-1], f"dropoff_{day}") for day, cols in DAY_COLS.items()],
+        default="dropoff_grid",
+    )
 
-    ws_result.append(HEADERS)
+    def append_styled(values):
+        ws_result.append([styled(ws_result, v, style=name) for v, name in zip(values, col_styles)])
 
+    append_styled(HEADERS)
+
+    first_day_col = DAY_COLS[WEEKDAYS[0]][0] - 1
     for number, name in roster_rows:
         row = [""] * len(HEADERS)
         row[0] = class_code
         row[1] = make_student_id(grade_num, class_num, number) if number else ""
         row[2] = name
 
-        rec = rec_by_number.get(number) or rec_by_name.get(name)
-        if rec:
-            for day in WEEKDAYS:
-                c_method, c_time, c_vehicle, c_loc = DAY_COLS[day]
-                d = rec.get("dropoff", {}).get(day, {})
-                row[c_method - 1] = d.get("method", "")
-                row[c_time - 1] = d.get("time", "")
-                row[c_vehicle - 1] = d.get("vehicle", "")
-                row[c_loc - 1] = d.get("location", "")
-
-        ws_result.append(row)
-
-    day_fills = {
-        "월요일": PatternFill(fill_type="solid", fgColor="00FFF2CC"),
-        "화요일": PatternFill(fill_type="solid", fgColor="00E2F0D9"),
-        "수요일": PatternFill(fill_type="solid", fgColor="00D9E1F2"),
-        "목요일": PatternFill(fill_type="solid", fgColor="00FCE4D6"),
-        "금요일": PatternFill(fill_type="solid", fgColor="00E4DFEC"),
-    }
-    day_cols = {
-        "월요일": range(4, 8),
-        "화요일": range(8, 12),
-        "수요일": range(12, 16),
-        "목요일": range(16, 20),
-        "금요일": range(20, 24),
-    }
-    for day, cols in day_cols.items():
-        fill = day_fills[day]
-        for r in range(1, ws_result.max_row + 1):
-            for c in cols:
-                ws_result.cell(r, c).fill = fill
+        pos = pos_by_number.get(number)
+        if pos is None:
+            pos = pos_by_name.get(name)
+        if pos is not None:
+            row[first_day_col:] = values_by_pos[pos]
 
-    thin = Side(style="thin", color="000000")
-    grid = Border(left=thin, right=thin, top=thin, bottom=thin)
-    for r in range(1, ws_result.max_row + 1):
-        for c in range(1, len(HEADERS) + 1):
-            ws_result.cell(r, c).border = grid
-
-    widths = {
-        1: 8, 2: 8, 3: 12,
-        4: 14, 5: 12, 6: 12, 7: 20,
-        8: 14, 9: 12, 10: 12, 11: 20,
-        12: 14, 13: 12, 14: 12, 15: 20,
-        16: 14, 17: 12, 18: 12, 19: 20,
-        20: 14, 21: 12, 22: 12, 23: 20,
-    }
-    for c, w in widths.items():
-        ws_result.column_dimensions[openpyxl.utils.get_column_letter(c)].width = w
-
-    out = BytesIO()
-    wb.save(out)
-    return out.getvalue()
\ No newline at end of file
+        append_styled(row)
+
+    for day in WEEKDAYS:
+        _write_day_summary(wb, cube, day)
+
+    return save_workbook(wb)
\ No newline at end of file
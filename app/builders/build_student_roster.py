@@ -1,10 +1,14 @@
 ﻿from io import BytesIO
+import bisect
 import datetime as dt
 import os
 import re
 
 import openpyxl
-from openpyxl.cell.cell import MergedCell
+
+from ..address_api import normalize_address
+from .sheet_writer import save_workbook
+from .template_cache import clone_workbook, freeze_workbook, get_compiled
 
 
 def _build_default_roster_template():
@@ -74,18 +78,6 @@ def _parse_int(v):
         return None
 
 
-def _normalize_address(addr):
-    s = str(addr or "").strip()
-    if not s:
-        return ""
-    s = re.sub(r"\s+", " ", s)
-    s = s.replace("부산시 ", "부산광역시 ")
-    s = s.replace("부산시", "부산광역시")
-    if re.match(r"^[가-힣]+구\b", s):
-        s = "부산광역시 " + s
-    return s
-
-
 def _normalize_birth_with_fallback(raw, parsed):
     raw_s = str(raw or "").strip()
     if isinstance(parsed, dt.date):
@@ -121,36 +113,125 @@ def _clean_siblings(value):
     return s
 
 
-def _assign_by_number(records, allowed_slots):
-    mapped = {}
-    used = set()
-    slot_set = set(allowed_slots)
+def _slot_sections(slots):
+    # Runs of consecutive slot numbers, e.g. 1-20 and 41-60 in the default template.
+    sections = []
+    for n in sorted(slots):
+        if sections and n == sections[-1][-1] + 1:
+            sections[-1].append(n)
+        else:
+            sections.append([n])
+    return sections
 
-    for rec in sorted(records, key=lambda x: (x.get("number") or 9999, x.get("name", ""))):
-        n = rec.get("number")
-        if n in slot_set and n not in used:
-            mapped[n] = rec
-            used.add(n)
 
-    remaining_records = [r for r in records if r not in mapped.values()]
-    remaining_slots = [s for s in allowed_slots if s not in used]
+def _allocate_slots(records, allowed_slots):
+    # Students keep their own number when the template has that slot (the first by
+    # name wins a duplicated number). The rest go, in name order, to the free slots
+    # of the section their number falls in, then to any free slot left; students
+    # without a number only take part in that last round. Everything is indexed by
+    # list position, so placement never compares records with each other.
+    sections = _slot_sections(allowed_slots)
+    starts = [sec[0] for sec in sections]
+    free = set(allowed_slots)
 
-    for rec, slot in zip(sorted(remaining_records, key=lambda x: (x.get("name", ""))), remaining_slots):
-        mapped[slot] = rec
+    claims = {}
+    for i, rec in enumerate(records):
+        if rec.number in free:
+            claims.setdefault(rec.number, []).append(i)
 
-    return mapped
+    mapped = {}
+    placed = set()
+    for n, idxs in claims.items():
+        i = min(idxs, key=lambda k: records[k].name)
+        mapped[n] = records[i]
+        placed.add(i)
+        free.discard(n)
+
+    by_section = [[] for _ in sections]
+    pool = []
+    for i, rec in enumerate(records):
+        if i in placed:
+            continue
+        if rec.number is None or not sections:
+            pool.append(i)
+        else:
+            by_section[max(bisect.bisect_right(starts, rec.number) - 1, 0)].append(i)
+
+    spilled = set()
+    for sec, idxs in zip(sections, by_section):
+        idxs.sort(key=lambda k: records[k].name)
+        open_slots = [n for n in sec if n in free]
+        for i, n in zip(idxs, open_slots):
+            mapped[n] = records[i]
+            free.discard(n)
+        rest = idxs[len(open_slots):]
+        spilled.update(rest)
+        pool.extend(rest)
+
+    pool.sort(key=lambda k: records[k].name)
+    open_slots = sorted(free)
+    overflow = []
+    for i, n in zip(pool, open_slots):
+        mapped[n] = records[i]
+        if i in spilled:
+            overflow.append((n, records[i]))
+
+    unplaced = [records[i] for i in pool[len(open_slots):]]
+    return {"mapped": mapped, "overflow": overflow, "unplaced": unplaced}
+
+
+def _safe_set(ws, merged, row, col, value):
+    if (row, col) in merged:
+        return
+    ws.cell(row, col).value = value
 
 
-def _safe_set(ws, row, col, value):
-    cell = ws.cell(row, col)
-    if isinstance(cell, MergedCell):
-        return
-    cell.value = value
+def _compile_roster_template(template_bytes, default_path, sheet_name):
+    wb = _load_workbook(template_bytes, default_path)
+    ws = wb[sheet_name] if sheet_name in wb.sheetnames else wb.active
 
+    # Slot rows carry the student number in column A; the year title row does not count.
+    num_to_row = {}
+    for r in range(1, ws.max_row + 1):
+        v = ws.cell(r, 1).value
+        if isinstance(v, str) and "학년도" in v:
+            continue
+        n = _parse_int(v)
+        if n is not None:
+            num_to_row[n] = r
 
-def build_student_roster(records, school_year, template_bytes=None, default_template_path=None):
-    wb = _load_workbook(template_bytes, default_template_path)
-    ws = wb["4-4"] if "4-4" in wb.sheetnames else wb.active
+    merged = set()
+    for rng in ws.merged_cells.ranges:
+        for r in range(rng.min_row, rng.max_row + 1):
+            for c in range(rng.min_col, rng.max_col + 1):
+                if (r, c) != (rng.min_row, rng.min_col):
+                    merged.add((r, c))
+
+    return {
+        "workbook": freeze_workbook(wb),
+        "sheet": ws.title,
+        "num_to_row": num_to_row,
+        "merged": frozenset(merged),
+    }
+
+
+def build_student_roster(
+    records,
+    school_year,
+    template_bytes=None,
+    default_template_path=None,
+    sheet_name="4-4",
+    errors=None,
+):
+    template = get_compiled(
+        ("roster", sheet_name),
+        template_bytes,
+        default_template_path,
+        lambda data, path: _compile_roster_template(data, path, sheet_name),
+    )
+    wb = clone_workbook(template["workbook"])
+    ws = wb[template["sheet"]]
+    merged = template["merged"]
 
     _replace_school_year(ws, school_year)
 
@@ -162,48 +243,56 @@ def build_student_roster(records, school_year, template_bytes=None, default_temp
         ws.cell(25, 1).value = "남"
 
     if records:
-        grade = records[0].get("grade_num") or 0
-        class_ = records[0].get("class_num") or 0
+        grade = records[0].grade_num or 0
+        class_ = records[0].class_num or 0
         ws.cell(2, 3).value = f"    {grade}학년      {class_}반     담임  : "
         ws.cell(2, 8).value = None
+        if grade and class_ and f"{grade}-{class_}" not in wb.sheetnames:
+            ws.title = f"{grade}-{class_}"
 
-    num_to_row = {}
-    for r in range(1, ws.max_row + 1):
-        n = _parse_int(ws.cell(r, 1).value)
-        if n is not None:
-            num_to_row[n] = r
-            for c in range(2, 11):
-                _safe_set(ws, r, c, None)
+    num_to_row = template["num_to_row"]
+    for r in num_to_row.values():
+        for c in range(2, 11):
+            _safe_set(ws, merged, r, c, None)
 
     all_slots = sorted(num_to_row.keys())
-    mapped = _assign_by_number(records, all_slots)
+    allocation = _allocate_slots(records, all_slots)
+    mapped = allocation["mapped"]
+
+    if errors is not None:
+        for slot, rec in allocation["overflow"]:
+            errors.append(
+                {"row": rec.row, "name": str(rec.name), "field": "번호", "value": rec.number, "issue": f"일람표 구역 부족: {slot}번 자리에 배치"}
+            )
+        for rec in allocation["unplaced"]:
+            errors.append(
+                {"row": rec.row, "name": str(rec.name), "field": "번호", "value": rec.number, "issue": "일람표 자리 부족: 배치되지 않음"}
+            )
 
     for slot, rec in mapped.items():
         r = num_to_row[slot]
-        _safe_set(ws, r, 1, slot)
-        _safe_set(ws, r, 2, rec.get("name", ""))
+        _safe_set(ws, merged, r, 1, slot)
+        _safe_set(ws, merged, r, 2, rec.name)
 
-        birth_date = _normalize_birth_with_fallback(rec.get("birth_raw", ""), rec.get("birth_date"))
+        birth_date = _normalize_birth_with_fallback(rec.birth_raw, rec.birth_date)
         if isinstance(birth_date, dt.date):
-            _safe_set(ws, r, 3, _format_birth_iso(birth_date))
+            _safe_set(ws, merged, r, 3, _format_birth_iso(birth_date))
         else:
-            _safe_set(ws, r, 3, rec.get("birth_raw", ""))
+            _safe_set(ws, merged, r, 3, rec.birth_raw)
 
-        address_raw = rec.get("address_raw", rec.get("address", ""))
-        address = rec.get("address_api") or _normalize_address(address_raw)
-        _safe_set(ws, r, 4, address)
+        address_raw = rec.address_raw
+        address = rec.address_api or normalize_address(address_raw)
+        _safe_set(ws, merged, r, 4, address)
 
-        _safe_set(ws, r, 5, rec.get("father_name", ""))
-        _safe_set(ws, r, 6, rec.get("mother_name", ""))
-        _safe_set(ws, r, 7, rec.get("father_phone", ""))
-        _safe_set(ws, r, 8, rec.get("mother_phone", ""))
-        _safe_set(ws, r, 9, _clean_siblings(rec.get("siblings", "")))
+        _safe_set(ws, merged, r, 5, rec.father_name)
+        _safe_set(ws, merged, r, 6, rec.mother_name)
+        _safe_set(ws, merged, r, 7, rec.father_phone)
+        _safe_set(ws, merged, r, 8, rec.mother_phone)
+        _safe_set(ws, merged, r, 9, _clean_siblings(rec.siblings))
 
         bus = ""
-        if rec.get("boarding_method") == "학교차량이용":
-            bus = rec.get("boarding_vehicle", "")
-        _safe_set(ws, r, 10, bus)
+        if rec.boarding_method == "학교차량이용":
+            bus = rec.boarding_vehicle
+        _safe_set(ws, merged, r, 10, bus)
 
-    out = BytesIO()
-    wb.save(out)
-    return out.getvalue()
\ No newline at end of file
+    return save_workbook(wb)
\ No newline at end of file
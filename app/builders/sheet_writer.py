@@ -0,0 +1,60 @@
+﻿from io import BytesIO
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+
+from ..timing import span
+
+
+def new_workbook(write_only=True):
+    # Write-only workbooks stream rows to disk as they are appended; ordinary ones are
+    # kept for callers that want to post-process the sheets. Both start with no sheets.
+    wb = openpyxl.Workbook(write_only=write_only)
+    if not write_only:
+        wb.remove(wb.active)
+    return wb
+
+
+def add_sheet(wb, title, widths=None):
+    # Column widths have to be declared before the first row in write-only mode.
+    ws = wb.create_sheet(title)
+    for col, width in (widths or {}).items():
+        ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = width
+    return ws
+
+
+def register_styles(wb, styles):
+    # Named styles are added to the workbook's style table once; cells then point at
+    # them by name, so applying one costs a lookup instead of hashing a Fill/Border.
+    known = set(wb.named_styles)
+    for style in styles:
+        if style.name not in known:
+            wb.add_named_style(style)
+            known.add(style.name)
+
+
+def column_styles(width, ranges, default=None):
+    # ranges: [(first_col, last_col, style_name), ...] with 1-based inclusive columns.
+    out = [default] * width
+    for first, last, name in ranges:
+        for c in range(first, last + 1):
+            out[c - 1] = name
+    return out
+
+
+def styled(ws, value, fill=None, border=None, style=None):
+    cell = WriteOnlyCell(ws, value=value)
+    if style is not None:
+        cell.style = style
+    if fill is not None:
+        cell.fill = fill
+    if border is not None:
+        cell.border = border
+    return cell
+
+
+def save_workbook(wb):
+    with span("save"):
+        out = BytesIO()
+        wb.save(out)
+        return out.getvalue()
@@ -0,0 +1,47 @@
+﻿from collections import OrderedDict
+import hashlib
+import os
+import pickle
+import threading
+
+MAX_TEMPLATES = 16
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def template_key(template_bytes=None, path=None):
+    # Uploaded templates are keyed by content, files on disk by path + mtime + size.
+    if template_bytes:
+        return ("bytes", hashlib.sha256(template_bytes).hexdigest())
+    if path and os.path.exists(path):
+        st = os.stat(path)
+        return ("path", os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    return ("none",)
+
+
+def get_compiled(kind, template_bytes, path, compile_fn):
+    # Process-wide cache of parsed templates; compile_fn(template_bytes, path) runs once
+    # per distinct template and its result must be treated as read-only by callers.
+    key = (kind, template_key(template_bytes, path))
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    compiled = compile_fn(template_bytes, path)
+    with _lock:
+        _cache[key] = compiled
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_TEMPLATES:
+            _cache.popitem(last=False)
+    return compiled
+
+
+def freeze_workbook(wb):
+    return pickle.dumps(wb, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def clone_workbook(frozen):
+    # Unpickling a parsed workbook is several times cheaper than load_workbook.
+    return pickle.loads(frozen)
@@ -0,0 +1,204 @@
+﻿from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+from .batch import convert_class, output_files, read_class_sheets, validation_log
+
+
+def collect_inputs(paths):
+    # Survey files given directly or found (non-recursively) in the given directories.
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(".xlsx") and not name.startswith("~$"):
+                    files.append(os.path.join(path, name))
+        else:
+            files.append(path)
+    return list(dict.fromkeys(files))
+
+
+def _file_label(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def output_labels(files):
+    # Output folder per file: its path without the extension, relative to the folder
+    # all inputs share, so a/설문.xlsx and b/설문.xlsx go to a/설문 and b/설문.
+    # Raises ValueError when two files would still land in the same folder.
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in files])
+    labels = {}
+    owners = {}
+    for path in files:
+        label = os.path.relpath(os.path.splitext(os.path.abspath(path))[0], root)
+        key = os.path.normcase(label).casefold()
+        if key in owners:
+            raise ValueError(f"산출물 폴더가 겹칩니다: {owners[key]}, {path} -> {label}")
+        owners[key] = path
+        labels[path] = label
+    return labels
+
+
+def _read_file(path):
+    started = time.perf_counter()
+    sheets = read_class_sheets(path, label=_file_label(path))
+    return sheets, time.perf_counter() - started
+
+
+def _write_outputs(output_dir, label, results, school_year):
+    written = {}
+    base = os.path.join(output_dir, label)
+    for res in results:
+        if res.get("error"):
+            continue
+        paths = []
+        for rel, data in output_files(res, school_year):
+            path = os.path.join(base, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as fh:
+                fh.write(data)
+            paths.append(path)
+        written[res["class"]] = paths
+    log = validation_log(results)
+    if log:
+        os.makedirs(base, exist_ok=True)
+        with open(os.path.join(base, "검증로그.csv"), "wb") as fh:
+            fh.write(log)
+    return written
+
+
+def _class_summary(res, paths):
+    return {
+        "class": res["class"],
+        "student_count": res.get("student_count", 0),
+        "warnings": len(res.get("errors", [])),
+        "api_ok": res.get("api_ok", 0),
+        "api_fail": res.get("api_fail", 0),
+        "cache_hits": res.get("cache_hits", 0),
+        "breaker": res.get("breaker", ""),
+        "elapsed_sec": round(res.get("elapsed", 0.0), 3),
+        "error": res.get("error", ""),
+        "stages": {t["stage"]: t["ms"] for t in res.get("timings", [])},
+        "outputs": paths,
+    }
+
+
+def run_conversion(files, output_dir, school_year, workers=None, **options):
+    # Files are read and classes converted on one process pool: each file's classes
+    # are queued as soon as that file has been read. Outputs go to
+    # <output_dir>/<output label>/<class>/..., one 검증로그.csv per file.
+    started = time.perf_counter()
+    labels = output_labels(files)
+    workers = workers or os.cpu_count() or 1
+    files_out = {path: {"path": path, "read_sec": 0.0, "classes": [], "error": ""} for path in files}
+    class_results = {path: [] for path in files}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        reads = {pool.submit(_read_file, path): path for path in files}
+        converts = {}
+        for fut in as_completed(reads):
+            path = reads[fut]
+            try:
+                sheets, read_sec = fut.result()
+            except Exception as e:
+                files_out[path]["error"] = f"{type(e).__name__}: {e}"
+                continue
+            files_out[path]["read_sec"] = round(read_sec, 3)
+            if not sheets:
+                files_out[path]["error"] = "학생 시트를 찾지 못했습니다."
+            for order, (name, rows) in enumerate(sheets):
+                converts[pool.submit(convert_class, name, rows, school_year, **options)] = (path, order)
+
+        for fut in as_completed(converts):
+            path, order = converts[fut]
+            class_results[path].append((order, fut.result()))
+
+    for path in files:
+        results = [res for _, res in sorted(class_results[path], key=lambda x: x[0])]
+        written = _write_outputs(output_dir, labels[path], results, school_year)
+        files_out[path]["output"] = os.path.join(output_dir, labels[path])
+        files_out[path]["classes"] = [_class_summary(res, written.get(res["class"], [])) for res in results]
+
+    file_list = [files_out[path] for path in files]
+    classes = [c for f in file_list for c in f["classes"]]
+    return {
+        "school_year": school_year,
+        "output_dir": output_dir,
+        "workers": workers,
+        "file_count": len(files),
+        "class_count": len(classes),
+        "student_count": sum(c["student_count"] for c in classes),
+        "failed": sum(1 for f in file_list if f["error"]) + sum(1 for c in classes if c["error"]),
+        "elapsed_sec": round(time.perf_counter() - started, 3),
+        "files": file_list,
+    }
+
+
+def _print_report(summary, out):
+    for f in summary["files"]:
+        status = f" 오류: {f['error']}" if f["error"] else ""
+        print(f"{f['path']}  읽기 {f['read_sec']:.2f}초{status}", file=out)
+        for c in f["classes"]:
+            detail = f"오류: {c['error']}" if c["error"] else f"{c['student_count']}명, 경고 {c['warnings']}건"
+            print(f"  {c['class']}  {c['elapsed_sec']:.2f}초  {detail}", file=out)
+    print(
+        f"합계: 파일 {summary['file_count']}개, 학급 {summary['class_count']}개, "
+        f"학생 {summary['student_count']}명, 실패 {summary['failed']}건, {summary['elapsed_sec']:.2f}초",
+        file=out,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app", description="등하교 설문 파일을 산출물 엑셀로 변환합니다.")
+    parser.add_argument("inputs", nargs="+", help="설문 파일(.xlsx) 또는 설문 파일이 든 폴더")
+    parser.add_argument("-o", "--output-dir", required=True, help="산출물을 저장할 폴더")
+    parser.add_argument("-y", "--school-year", type=int, default=date.today().year, help="학년도")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="동시에 변환할 프로세스 수")
+    parser.add_argument("--roster-template", default="template_roster.xlsx")
+    parser.add_argument("--dropoff-template", default="template_dropoff.xlsx")
+    parser.add_argument("--plan-dir", default=os.getenv("COLUMN_PLAN_DIR", ".column_plans"))
+    parser.add_argument("--json", action="store_true", help="요약을 JSON으로 출력")
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "WARNING"), help="단계별 시간 로그는 INFO")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    files = collect_inputs(args.inputs)
+    if not files:
+        parser.error("변환할 설문 파일이 없습니다.")
+    try:
+        output_labels(files)
+    except ValueError as e:
+        parser.error(str(e))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    summary = run_conversion(
+        files,
+        args.output_dir,
+        args.school_year,
+        workers=args.workers,
+        roster_template_path=args.roster_template,
+        dropoff_template_path=args.dropoff_template,
+        juso_key=os.getenv("JUSO_API_KEY", ""),
+        plan_dir=args.plan_dir,
+        address_cache_path=os.getenv("ADDRESS_CACHE_PATH", ".address_cache.sqlite3"),
+        address_backend=os.getenv("ADDRESS_BACKEND", "juso"),
+        address_index_path=os.getenv("ADDRESS_INDEX_PATH", "address_index.bin"),
+    )
+    with open(os.path.join(args.output_dir, "summary.json"), "w", encoding="utf-8") as fh:
+        json.dump(summary, fh, ensure_ascii=False, indent=2)
+
+    if args.json:
+        json.dump(summary, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        _print_report(summary, sys.stdout)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
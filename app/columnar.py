@@ -0,0 +1,164 @@
+﻿import pandas as pd
+
+from .mapper import make_student_id
+from .record import DROPOFF_FIELDS, RECORD_FIELDS, WEEKDAYS
+
+SCHOOL_BUS = "학교차량이용"
+BOARDING_COLUMNS = ["vehicle", "location", "sid", "name", "phone"]
+DROPOFF_COLUMNS = ["pos", "number", "name", "day"] + list(DROPOFF_FIELDS)
+BOARDING = "등교"
+DROPOFF = "하교"
+CUBE_KEYS = ["direction", "day", "slot", "vehicle", "location"]
+TRIP_COLUMNS = CUBE_KEYS + ["sid", "name", "phone"]
+
+
+def _category(values):
+    # Categories in lexical order, so sorting on codes matches sorting on strings.
+    values = ["" if v is None else str(v) for v in values]
+    return pd.Categorical(values, categories=sorted(set(values)), ordered=True)
+
+
+def vehicle_number(vehicles):
+    # Vehicle sort number: all digits of the label joined, 9999 if there are none.
+    digits = pd.Series(vehicles, dtype=object).astype(str).str.replace(r"\D", "", regex=True)
+    return pd.to_numeric(digits.where(digits != ""), errors="coerce").fillna(9999).astype("int64")
+
+
+def records_frame(records):
+    data = {f: [getattr(r, f) for r in records] for f in RECORD_FIELDS}
+    frame = pd.DataFrame(data, columns=list(RECORD_FIELDS))
+    frame["sid"] = [make_student_id(r.grade_num, r.class_num, r.number) for r in records]
+    frame["phone"] = [r.mother_phone or r.main_parent_phone or "" for r in records]
+    frame["boarding_vehicle"] = _category(data["boarding_vehicle"])
+    frame["boarding_location"] = _category(data["boarding_location"])
+    return frame
+
+
+def dropoff_frame(records):
+    # Long format: one row per (student, weekday).
+    rows = [
+        (pos, r.number, r.name, day) + tuple(slot)
+        for pos, r in enumerate(records)
+        for day, slot in zip(WEEKDAYS, r.dropoff_grid)
+    ]
+    frame = pd.DataFrame(rows, columns=DROPOFF_COLUMNS, dtype=object)
+    frame["pos"] = frame["pos"].astype("int64")
+    frame["day"] = pd.Categorical(frame["day"], categories=WEEKDAYS, ordered=True)
+    frame["vehicle"] = _category(frame["vehicle"])
+    frame["location"] = _category(frame["location"])
+    return frame
+
+
+def boarding_detail_frame(frame):
+    # School-bus riders sorted by (vehicle number, vehicle, location, student id).
+    riders = frame[frame["boarding_method"] == SCHOOL_BUS]
+    detail = pd.DataFrame(
+        {
+            "vehicle": riders["boarding_vehicle"].astype(str),
+            "location": riders["boarding_location"].astype(str),
+            "sid": riders["sid"],
+            "name": riders["name"],
+            "phone": riders["phone"],
+        },
+        columns=BOARDING_COLUMNS,
+    )
+    detail["vehicle_num"] = vehicle_number(detail["vehicle"]).to_numpy()
+    detail = detail.sort_values(["vehicle_num", "vehicle", "location", "sid"], kind="stable")
+    return detail.drop(columns="vehicle_num").reset_index(drop=True)
+
+
+def dropoff_wide_rows(dropoff):
+    # (pos -> [method, time, vehicle, location] x WEEKDAYS) in dropoff sheet column order.
+    if dropoff.empty:
+        return {}
+    wide = dropoff.pivot(index="pos", columns="day", values=list(DROPOFF_FIELDS))
+    wide = wide[[(f, day) for day in WEEKDAYS for f in DROPOFF_FIELDS]]
+    return dict(zip(wide.index, wide.astype(object).to_numpy().tolist()))
+
+
+def count_table(detail, index="location", columns="vehicle"):
+    # One pass over detail via crosstab. Rows come out in lexical order and columns in
+    # the order they first appear in detail (vehicle order for boarding_detail_frame).
+    row_labels = sorted(set(detail[index]))
+    col_labels = list(dict.fromkeys(detail[columns]))
+    if detail.empty:
+        table = pd.DataFrame(index=row_labels, columns=col_labels, dtype="int64")
+    else:
+        table = pd.crosstab(detail[index], detail[columns]).reindex(index=row_labels, columns=col_labels, fill_value=0)
+    table = table.rename_axis(index=None, columns=None).astype("int64")
+    row_totals = table.sum(axis=1)
+    col_totals = table.sum(axis=0)
+    return {"table": table, "row_totals": row_totals, "col_totals": col_totals, "total": int(row_totals.sum())}
+
+
+def _dropoff_trips(frame, dropoff):
+    rides = dropoff[dropoff["method"] == SCHOOL_BUS]
+    slot = rides["time"].astype(str).str.extract(r"([123])\s*하교", expand=False)
+    students = frame.iloc[rides["pos"].to_numpy()]
+    return pd.DataFrame(
+        {
+            "direction": DROPOFF,
+            "day": rides["day"].astype(str).to_numpy(),
+            "slot": pd.to_numeric(slot, errors="coerce").fillna(0).astype("int64").to_numpy(),
+            "vehicle": rides["vehicle"].astype(str).to_numpy(),
+            "location": rides["location"].astype(str).to_numpy(),
+            "sid": students["sid"].to_numpy(),
+            "name": students["name"].to_numpy(),
+            "phone": students["phone"].to_numpy(),
+        },
+        columns=TRIP_COLUMNS,
+    )
+
+
+def build_cube(records):
+    # Everything the builders need, computed once per conversion. "trips" holds one
+    # row per bus ride: boarding (day "", slot 0) and each weekday's dropoff, sorted by
+    # direction, weekday, slot, vehicle, location and student id; the builders read
+    # their student lists from it with cube_trips. "counts" is the ride count per
+    # CUBE_KEYS cell.
+    frame = records_frame(records)
+    dropoff = dropoff_frame(records)
+    boarding = boarding_detail_frame(frame)
+
+    boarding_trips = boarding.assign(direction=BOARDING, day="", slot=0)[TRIP_COLUMNS]
+    trips = pd.concat([boarding_trips, _dropoff_trips(frame, dropoff)], ignore_index=True)
+    trips["slot"] = trips["slot"].astype("int64")
+    day_order = {d: i for i, d in enumerate([""] + WEEKDAYS)}
+    trips = (
+        trips.assign(_day=trips["day"].map(day_order), _vnum=vehicle_number(trips["vehicle"]).to_numpy())
+        .sort_values(["direction", "_day", "slot", "_vnum", "vehicle", "location", "sid"], kind="stable")
+        .drop(columns=["_day", "_vnum"])
+        .reset_index(drop=True)
+    )
+    counts = trips.groupby(CUBE_KEYS, sort=False).size()
+    return {"records": frame, "dropoff": dropoff, "trips": trips, "counts": counts}
+
+
+def cube_trips(cube, **keys):
+    # Rides matching the given CUBE_KEYS values, in cube order, e.g.
+    # cube_trips(cube, direction=BOARDING) for the boarding lists.
+    trips = cube["trips"]
+    mask = pd.Series(True, index=trips.index)
+    for key, value in keys.items():
+        mask &= trips[key] == value
+    return trips[mask].reset_index(drop=True)
+
+
+def cube_counts(cube, **keys):
+    counts = cube["counts"]
+    if counts.empty:
+        return counts
+    mask = pd.Series(True, index=counts.index)
+    for key, value in keys.items():
+        mask &= counts.index.get_level_values(key) == value
+    return counts[mask]
+
+
+def dropoff_summary(cube, day):
+    # Rides on one weekday as (slot, location) x vehicle counts, read off the cube counts.
+    counts = cube_counts(cube, direction=DROPOFF, day=day)
+    if counts.empty:
+        return pd.DataFrame(dtype="int64")
+    table = counts.droplevel(["direction", "day"]).unstack("vehicle", fill_value=0)
+    vehicles = sorted(table.columns, key=lambda v: (int(vehicle_number([v])[0]), v))
+    return table.sort_index()[vehicles].astype("int64")
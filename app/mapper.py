@@ -1,23 +1,22 @@
-﻿import re
+﻿import bisect
+import hashlib
+import json
+import os
+import re
+import tempfile
 
-from .normalizer import clean_choice_prefix, normalize_date, normalize_phone
+from .normalizer import clean_choice_prefix_series, normalize_date_series, normalize_phone_series
+from .record import WEEKDAYS, StudentRecord
 
-WEEKDAYS = ["월요일", "화요일", "수요일", "목요일", "금요일"]
+CHUNK_ROWS = 512
 
 
-def _contains(text, token):
-    return token in str(text or "")
-
-
-def _first_idx(headers, token):
-    for i, h in enumerate(headers):
-        if _contains(h, token):
-            return i
-    return None
-
-
-def _all_idx(headers, token):
-    return [i for i, h in enumerate(headers) if _contains(h, token)]
+def _first_idx(index, token):
+    # Field labels are posted against the raw header, since they keep their punctuation.
+    positions = index["postings"].get(token)
+    if positions is None:
+        positions = [i for i, h in enumerate(index["raw"]) if token in h]
+    return positions[0] if positions else None
 
 
 def _first_value(row, indices):
@@ -46,30 +45,66 @@ def _norm_header(h):
     return s
 
 
-def _all_idx_by_tokens(headers, include_tokens):
-    out = []
-    for i, h in enumerate(headers):
-        hs = _norm_header(h)
-        if all(t in hs for t in include_tokens):
-            out.append(i)
-    return out
+HEADER_TOKENS = ["하교", "방법", "시간", "차량", "장소", "하차", "승차", "승차지", "등교"]
+_HEADER_TIME_RE = re.compile(r"([123])하교")
+
+
+def build_header_index(headers):
+    raw = [str(h or "") for h in headers]
+    norm = [_norm_header(h) for h in headers]
+    # Weekday names and field labels are matched against the raw header, everything
+    # else against the normalized one.
+    field_tokens = list(dict.fromkeys(FIELD_TOKENS.values()))
+    postings = {t: [] for t in WEEKDAYS + HEADER_TOKENS + ["1하교", "2하교", "3하교"] + field_tokens}
+    time_marker = [None] * len(headers)
+
+    for i, (h, hs) in enumerate(zip(raw, norm)):
+        for day in WEEKDAYS:
+            if day in h:
+                postings[day].append(i)
+        for t in field_tokens:
+            if t in h:
+                postings[t].append(i)
+        for t in HEADER_TOKENS:
+            if t in hs:
+                postings[t].append(i)
+        m = _HEADER_TIME_RE.search(hs)
+        if m:
+            time_marker[i] = int(m.group(1))
+        for t in (1, 2, 3):
+            if f"{t}하교" in hs:
+                postings[f"{t}하교"].append(i)
+
+    return {"raw": raw, "norm": norm, "postings": postings, "time": time_marker}
+
 
+def _all_idx_by_tokens(index, include_tokens):
+    postings = index["postings"]
+    if all(t in postings for t in include_tokens):
+        if not include_tokens:
+            return list(range(len(index["norm"])))
+        common = set(postings[include_tokens[0]]).intersection(*(postings[t] for t in include_tokens[1:]))
+        return sorted(common)
+    return [i for i, hs in enumerate(index["norm"]) if all(t in hs for t in include_tokens)]
 
-def _boarding_loc_indices(headers, idx_boarding_vehicle, day_method):
+
+def _positions_in_range(positions, start, stop):
+    return positions[bisect.bisect_left(positions, start):bisect.bisect_left(positions, stop)]
+
+
+def _boarding_loc_indices(index, idx_boarding_vehicle, day_method):
     # 1) direct match: headers explicitly mentioning 등교+승차+장소
-    direct = _all_idx_by_tokens(headers, ["등교", "승차", "장소"])
+    direct = _all_idx_by_tokens(index, ["등교", "승차", "장소"])
     if direct:
         return direct
 
     # 2) fallback: location-like columns in boarding section (between 등교차량 and first 하교 block)
-    first_day_start = min(day_method.values()) if day_method else len(headers)
+    postings = index["postings"]
+    first_day_start = min(day_method.values()) if day_method else len(index["norm"])
     start = (idx_boarding_vehicle + 1) if idx_boarding_vehicle is not None else 0
-    out = []
-    for i in range(start, first_day_start):
-        hs = _norm_header(headers[i])
-        if ("장소" in hs or "승차지" in hs) and ("하차" not in hs):
-            out.append(i)
-    return out
+    excluded = set(postings["하차"])
+    candidates = sorted(set(postings["장소"]) | set(postings["승차지"]))
+    return [i for i in _positions_in_range(candidates, start, first_day_start) if i not in excluded]
 
 
 def _parse_number(value):
@@ -92,7 +127,8 @@ def _parse_time_num(text):
     return None
 
 
-def _parse_day_segments(headers):
+def _parse_day_segments(index):
+    postings = index["postings"]
     day_method = {}
     day_time = {}
     day_vehicle_by_time = {d: {} for d in WEEKDAYS}
@@ -100,20 +136,8 @@ def _parse_day_segments(headers):
 
     day_anchors = []
     for day in WEEKDAYS:
-        idx_method = None
-        idx_time = None
-
-        for i, h in enumerate(headers):
-            hs = _norm_header(h)
-            if day in str(h or "") and ("하교방법" in hs or ("하교" in hs and "방법" in hs)):
-                idx_method = i
-                break
-
-        for i, h in enumerate(headers):
-            hs = _norm_header(h)
-            if day in str(h or "") and ("하교시간" in hs or ("하교" in hs and "시간" in hs)):
-                idx_time = i
-                break
+        idx_method = next(iter(_all_idx_by_tokens(index, [day, "하교", "방법"])), None)
+        idx_time = next(iter(_all_idx_by_tokens(index, [day, "하교", "시간"])), None)
 
         if idx_method is not None:
             day_method[day] = idx_method
@@ -126,27 +150,20 @@ def _parse_day_segments(headers):
 
     day_anchors.sort(key=lambda x: x[1])
 
+    vehicle_cols = postings["차량"]
+    location_cols = sorted(set(postings["장소"]) | set(postings["하차"]))
+
     for i, (day, start_idx) in enumerate(day_anchors):
-        next_start = day_anchors[i + 1][1] if i + 1 < len(day_anchors) else len(headers)
-        rng = list(range(start_idx, next_start))
-
-        veh_candidates = []
-        loc_candidates = []
-        for c in rng:
-            hs = _norm_header(headers[c])
-            if "차량" in hs:
-                veh_candidates.append(c)
-            if ("장소" in hs) or ("하차" in hs):
-                loc_candidates.append(c)
+        next_start = day_anchors[i + 1][1] if i + 1 < len(day_anchors) else len(index["norm"])
+
+        veh_candidates = _positions_in_range(vehicle_cols, start_idx, next_start)
+        loc_candidates = _positions_in_range(location_cols, start_idx, next_start)
 
         # Explicit mapping from header, e.g. (화,1하교), (수,2하교), (목,3하교)
         for c in veh_candidates:
-            hs = _norm_header(headers[c])
-            m = re.search(r"([123])하교", hs)
-            if m:
-                t = int(m.group(1))
-                if t not in day_vehicle_by_time[day]:
-                    day_vehicle_by_time[day][t] = c
+            t = index["time"][c]
+            if t is not None and t not in day_vehicle_by_time[day]:
+                day_vehicle_by_time[day][t] = c
 
         # If no explicit time marker exists, map in order to available times.
         if not day_vehicle_by_time[day] and veh_candidates:
@@ -158,7 +175,7 @@ def _parse_day_segments(headers):
         if sorted_v:
             for j, (t, vc) in enumerate(sorted_v):
                 next_vc = sorted_v[j + 1][1] if j + 1 < len(sorted_v) else next_start
-                locs = [x for x in range(vc + 1, next_vc) if x in loc_candidates]
+                locs = _positions_in_range(loc_candidates, vc + 1, next_vc)
                 if not locs:
                     locs = loc_candidates[:]
                 day_loc_by_time[day][t] = locs
@@ -173,136 +190,283 @@ def _parse_day_segments(headers):
     return day_method, day_time, day_vehicle_by_time, day_loc_by_time
 
 
-def build_student_records(ws):
-    headers = [ws.cell(1, c).value for c in range(1, ws.max_column + 1)]
-
-    idx = {
-        "name": _first_idx(headers, "학생이름"),
-        "grade": _first_idx(headers, "학년"),
-        "class": _first_idx(headers, "반"),
-        "number": _first_idx(headers, "번호"),
-        "birth": _first_idx(headers, "생년월일"),
-        "address": _first_idx(headers, "주소(도로명주소)"),
-        "mother_name": _first_idx(headers, "어머니 성명"),
-        "mother_phone": _first_idx(headers, "어머니의 전화번호"),
-        "father_name": _first_idx(headers, "아버지 성명"),
-        "father_phone": _first_idx(headers, "아버지의 전화번호"),
-        "siblings": _first_idx(headers, "형제가 있다면"),
-        "boarding_method": _first_idx(headers, "(등교)_등교 방법"),
-        "boarding_vehicle": _first_idx(headers, "(등교)_등교 탑승 차량"),
-        "main_parent_phone": _first_idx(headers, "주 학부모전화번호"),
+FIELD_TOKENS = {
+    "name": "학생이름",
+    "grade": "학년",
+    "class": "반",
+    "number": "번호",
+    "birth": "생년월일",
+    "address": "주소(도로명주소)",
+    "mother_name": "어머니 성명",
+    "mother_phone": "어머니의 전화번호",
+    "father_name": "아버지 성명",
+    "father_phone": "아버지의 전화번호",
+    "siblings": "형제가 있다면",
+    "boarding_method": "(등교)_등교 방법",
+    "boarding_vehicle": "(등교)_등교 탑승 차량",
+    "main_parent_phone": "주 학부모전화번호",
+}
+
+PLAN_VERSION = 1
+
+
+def header_hash(headers):
+    payload = json.dumps(["" if h is None else str(h) for h in headers], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def compile_column_plan(headers):
+    index = build_header_index(headers)
+    idx = {field: _first_idx(index, token) for field, token in FIELD_TOKENS.items()}
+    day_method, day_time, day_vehicle_by_time, day_loc_by_time = _parse_day_segments(index)
+    boarding_loc_indices = _boarding_loc_indices(index, idx["boarding_vehicle"], day_method)
+
+    # JSON object keys are strings, so time slots are stored as "1"/"2"/"3".
+    return {
+        "version": PLAN_VERSION,
+        "header_hash": header_hash(headers),
+        "fields": idx,
+        "boarding_location": boarding_loc_indices,
+        "day_method": day_method,
+        "day_time": day_time,
+        "day_vehicle_by_time": {d: {str(t): c for t, c in m.items()} for d, m in day_vehicle_by_time.items()},
+        "day_loc_by_time": {d: {str(t): list(c) for t, c in m.items()} for d, m in day_loc_by_time.items()},
     }
 
-    day_method, day_time, day_vehicle_by_time, day_loc_by_time = _parse_day_segments(headers)
-    boarding_loc_indices = _boarding_loc_indices(headers, idx["boarding_vehicle"], day_method)
 
-    records = []
-    errors = []
-
-    for r in range(2, ws.max_row + 1):
-        row = [ws.cell(r, c).value for c in range(1, ws.max_column + 1)]
-        name = row[idx["name"]] if idx["name"] is not None else None
+def _unpack_plan(plan):
+    idx = {field: plan.get("fields", {}).get(field) for field in FIELD_TOKENS}
+    day_vehicle_by_time = {d: {} for d in WEEKDAYS}
+    day_loc_by_time = {d: {} for d in WEEKDAYS}
+    for d, m in (plan.get("day_vehicle_by_time") or {}).items():
+        day_vehicle_by_time.setdefault(d, {}).update({int(t): c for t, c in m.items()})
+    for d, m in (plan.get("day_loc_by_time") or {}).items():
+        day_loc_by_time.setdefault(d, {}).update({int(t): list(c) for t, c in m.items()})
+    return (
+        idx,
+        dict(plan.get("day_method") or {}),
+        dict(plan.get("day_time") or {}),
+        day_vehicle_by_time,
+        day_loc_by_time,
+        list(plan.get("boarding_location") or []),
+    )
+
+
+def load_column_plan(path):
+    with open(path, encoding="utf-8") as f:
+        plan = json.load(f)
+    if plan.get("version") != PLAN_VERSION:
+        raise ValueError(f"지원하지 않는 컬럼 매핑 버전: {plan.get('version')}")
+    return plan
+
+
+def save_column_plan(plan, path):
+    # Each writer gets its own temp file, so worker processes saving the same plan at
+    # once never truncate each other's file before the rename.
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=os.path.dirname(path) or ".", prefix=".plan-", suffix=".tmp", delete=False
+    ) as f:
+        tmp = f.name
+        try:
+            json.dump(plan, f, ensure_ascii=False, indent=2)
+        except Exception:
+            f.close()
+            os.remove(tmp)
+            raise
+    os.replace(tmp, path)
+
+
+def resolve_column_plan(headers, plan=None, plan_dir=None):
+    # Explicit (hand-corrected) plan > <plan_dir>/<header_hash>.json > fresh inference.
+    # A fresh plan is written back so the next upload of the same form skips inference.
+    digest = header_hash(headers)
+    if plan is not None:
+        if plan.get("version") != PLAN_VERSION:
+            raise ValueError(f"지원하지 않는 컬럼 매핑 버전: {plan.get('version')}")
+        if plan.get("header_hash") != digest:
+            raise ValueError("컬럼 매핑이 설문 헤더와 일치하지 않습니다.")
+        return plan
+
+    path = os.path.join(plan_dir, f"{digest}.json") if plan_dir else None
+    if path and os.path.exists(path):
+        try:
+            cached = load_column_plan(path)
+        except (OSError, ValueError):
+            cached = None
+        if cached and cached.get("header_hash") == digest:
+            return cached
+
+    compiled = compile_column_plan(headers)
+    if path:
+        try:
+            os.makedirs(plan_dir, exist_ok=True)
+            save_column_plan(compiled, path)
+        except OSError:
+            pass
+    return compiled
+
+
+def _iter_named_chunks(rows, width, name_idx):
+    chunk = []
+    for r, values in enumerate(rows, start=2):
+        # read-only sheets may yield ragged rows; pad to the header width.
+        row = list(values[:width]) if values else []
+        if len(row) < width:
+            row.extend([None] * (width - len(row)))
+        name = row[name_idx] if name_idx is not None else None
         if name in (None, ""):
             continue
+        chunk.append((r, row))
+        if len(chunk) >= CHUNK_ROWS:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _column(chunk, c):
+    if c is None:
+        return [None] * len(chunk)
+    return [row[c] for _, row in chunk]
+
+
+def iter_student_records(rows, errors=None, plan=None, plan_dir=None):
+    rows = iter(rows)
+    headers = list(next(rows, None) or [])
+    width = len(headers)
+    if errors is None:
+        errors = []
+
+    plan = resolve_column_plan(headers, plan, plan_dir)
+    idx, day_method, day_time, day_vehicle_by_time, day_loc_by_time, boarding_loc_indices = _unpack_plan(plan)
+
+    choice_cols = {idx["boarding_method"], idx["boarding_vehicle"], *boarding_loc_indices}
+    choice_cols.update(day_method.values())
+    choice_cols.update(day_time.values())
+    for by_time in day_vehicle_by_time.values():
+        choice_cols.update(by_time.values())
+    for by_time in day_loc_by_time.values():
+        for locs in by_time.values():
+            choice_cols.update(locs)
+    choice_cols.discard(None)
+
+    for chunk in _iter_named_chunks(rows, width, idx["name"]):
+        # Normalize whole columns of the chunk at once, then assemble records row by row.
+        birth_dts, birth_errs = (x.tolist() for x in normalize_date_series(_column(chunk, idx["birth"])))
+        mother_phones, mother_errs = (x.tolist() for x in normalize_phone_series(_column(chunk, idx["mother_phone"])))
+        father_phones, father_errs = (x.tolist() for x in normalize_phone_series(_column(chunk, idx["father_phone"])))
+        main_phones = normalize_phone_series(_column(chunk, idx["main_parent_phone"]))[0].tolist()
+        cleaned = {c: clean_choice_prefix_series(_column(chunk, c)).tolist() for c in choice_cols}
+        cleaned[None] = [""] * len(chunk)
+
+        for k, (r, row) in enumerate(chunk):
+            name = row[idx["name"]]
+
+            number_raw = row[idx["number"]] if idx["number"] is not None else None
+            number = _parse_number(number_raw)
+            if number is None:
+                errors.append({"row": r, "name": str(name), "field": "번호", "value": number_raw, "issue": "번호 파싱 실패"})
+
+            birth_dt, birth_err = birth_dts[k], birth_errs[k]
+            if birth_err:
+                value = row[idx["birth"]] if idx["birth"] is not None else None
+                errors.append({"row": r, "name": str(name), "field": "생년월일", "value": value, "issue": birth_err})
+
+            mother_phone, e1 = mother_phones[k], mother_errs[k]
+            if e1:
+                value = row[idx["mother_phone"]] if idx["mother_phone"] is not None else None
+                errors.append({"row": r, "name": str(name), "field": "어머니전화", "value": value, "issue": e1})
+
+            father_phone, e2 = father_phones[k], father_errs[k]
+            if e2:
+                value = row[idx["father_phone"]] if idx["father_phone"] is not None else None
+                errors.append({"row": r, "name": str(name), "field": "아버지전화", "value": value, "issue": e2})
+
+            main_parent_phone = main_phones[k]
+
+            boarding_method = cleaned[idx["boarding_method"]][k]
+            boarding_vehicle = cleaned[idx["boarding_vehicle"]][k]
+            boarding_loc = cleaned[_first_nonempty_index(row, boarding_loc_indices)][k]
+
+            dropoff = []
+            for day in WEEKDAYS:
+                method = cleaned[day_method.get(day)][k]
+                time = cleaned[day_time.get(day)][k]
+                vehicle = ""
+                location = ""
+
+                if method == "학교차량이용":
+                    tnum = _parse_time_num(time)
+                    v_idx = day_vehicle_by_time.get(day, {}).get(tnum) if tnum else None
+
+                    # Fallback: use first non-empty vehicle among this day's candidates.
+                    if v_idx is None or row[v_idx] in (None, ""):
+                        v_cands = []
+                        for vv in day_vehicle_by_time.get(day, {}).values():
+                            if vv not in v_cands:
+                                v_cands.append(vv)
+                        v_idx = _first_nonempty_index(row, v_cands) or v_idx
+
+                    vehicle = cleaned[v_idx][k]
+
+                    loc_candidates = day_loc_by_time.get(day, {}).get(tnum, []) if tnum else []
+                    if not loc_candidates:
+                        all_locs = []
+                        for locs in day_loc_by_time.get(day, {}).values():
+                            for x in locs:
+                                if x not in all_locs:
+                                    all_locs.append(x)
+                        loc_candidates = all_locs
+
+                    location = cleaned[_first_nonempty_index(row, loc_candidates)][k]
+
+                dropoff.append((method, time, vehicle, location))
+
+            grade = str(row[idx["grade"]] if idx["grade"] is not None else "")
+            class_ = str(row[idx["class"]] if idx["class"] is not None else "")
+
+            record = StudentRecord(
+                row=r,
+                name=str(name).strip(),
+                grade_text=grade,
+                class_text=class_,
+                grade_num=int("".join(ch for ch in grade if ch.isdigit()) or 0),
+                class_num=int("".join(ch for ch in class_ if ch.isdigit()) or 0),
+                number=number,
+                birth_date=birth_dt,
+                birth_raw=row[idx["birth"]] if idx["birth"] is not None else "",
+                address=str(row[idx["address"]] or "").strip() if idx["address"] is not None else "",
+                address_raw=row[idx["address"]] if idx["address"] is not None else "",
+                mother_name=str(row[idx["mother_name"]] or "").strip() if idx["mother_name"] is not None else "",
+                mother_phone=mother_phone,
+                father_name=str(row[idx["father_name"]] or "").strip() if idx["father_name"] is not None else "",
+                father_phone=father_phone,
+                siblings=str(row[idx["siblings"]] or "").strip() if idx["siblings"] is not None else "",
+                boarding_method=boarding_method,
+                boarding_vehicle=boarding_vehicle,
+                boarding_location=boarding_loc,
+                main_parent_phone=main_parent_phone,
+                dropoff_grid=tuple(dropoff),
+            )
 
-        number_raw = row[idx["number"]] if idx["number"] is not None else None
-        number = _parse_number(number_raw)
-        if number is None:
-            errors.append({"row": r, "name": str(name), "field": "번호", "value": number_raw, "issue": "번호 파싱 실패"})
-
-        birth_dt, birth_err = normalize_date(row[idx["birth"]] if idx["birth"] is not None else None)
-        if birth_err:
-            errors.append({"row": r, "name": str(name), "field": "생년월일", "value": row[idx["birth"]], "issue": birth_err})
-
-        mother_phone, e1 = normalize_phone(row[idx["mother_phone"]] if idx["mother_phone"] is not None else None)
-        if e1:
-            errors.append({"row": r, "name": str(name), "field": "어머니전화", "value": row[idx["mother_phone"]], "issue": e1})
-
-        father_phone, e2 = normalize_phone(row[idx["father_phone"]] if idx["father_phone"] is not None else None)
-        if e2:
-            errors.append({"row": r, "name": str(name), "field": "아버지전화", "value": row[idx["father_phone"]], "issue": e2})
-
-        main_parent_phone, _ = normalize_phone(row[idx["main_parent_phone"]] if idx["main_parent_phone"] is not None else None)
+            addr = str(row[idx["address"]] or "").strip() if idx["address"] is not None else ""
+            if addr and ("구" not in addr):
+                errors.append(
+                    {
+                        "row": r,
+                        "name": str(name),
+                        "field": "주소",
+                        "value": addr,
+                        "issue": "구(區) 정보 누락 의심",
+                    }
+                )
 
-        boarding_method = clean_choice_prefix(row[idx["boarding_method"]] if idx["boarding_method"] is not None else None)
-        boarding_vehicle = clean_choice_prefix(row[idx["boarding_vehicle"]] if idx["boarding_vehicle"] is not None else None)
-        boarding_loc = clean_choice_prefix(_first_value(row, boarding_loc_indices))
+            yield record
 
-        dropoff = {}
-        for day in WEEKDAYS:
-            method = clean_choice_prefix(row[day_method[day]]) if day_method.get(day) is not None else ""
-            time = clean_choice_prefix(row[day_time[day]]) if day_time.get(day) is not None else ""
-            vehicle = ""
-            location = ""
-
-            if method == "학교차량이용":
-                tnum = _parse_time_num(time)
-                v_idx = day_vehicle_by_time.get(day, {}).get(tnum) if tnum else None
-
-                # Fallback: use first non-empty vehicle among this day's candidates.
-                if v_idx is None or row[v_idx] in (None, ""):
-                    v_cands = []
-                    for vv in day_vehicle_by_time.get(day, {}).values():
-                        if vv not in v_cands:
-                            v_cands.append(vv)
-                    v_idx = _first_nonempty_index(row, v_cands) or v_idx
-
-                vehicle = clean_choice_prefix(row[v_idx]) if v_idx is not None else ""
-
-                loc_candidates = day_loc_by_time.get(day, {}).get(tnum, []) if tnum else []
-                if not loc_candidates:
-                    all_locs = []
-                    for locs in day_loc_by_time.get(day, {}).values():
-                        for x in locs:
-                            if x not in all_locs:
-                                all_locs.append(x)
-                    loc_candidates = all_locs
-
-                location = clean_choice_prefix(_first_value(row, loc_candidates))
-
-            dropoff[day] = {"method": method, "time": time, "vehicle": vehicle, "location": location}
-
-        grade = str(row[idx["grade"]] if idx["grade"] is not None else "")
-        class_ = str(row[idx["class"]] if idx["class"] is not None else "")
-
-        records.append(
-            {
-                "row": r,
-                "name": str(name).strip(),
-                "grade_text": grade,
-                "class_text": class_,
-                "grade_num": int("".join(ch for ch in grade if ch.isdigit()) or 0),
-                "class_num": int("".join(ch for ch in class_ if ch.isdigit()) or 0),
-                "number": number,
-                "birth_date": birth_dt,
-                "birth_raw": row[idx["birth"]] if idx["birth"] is not None else "",
-                "address": str(row[idx["address"]] or "").strip() if idx["address"] is not None else "",
-                "address_raw": row[idx["address"]] if idx["address"] is not None else "",
-                "mother_name": str(row[idx["mother_name"]] or "").strip() if idx["mother_name"] is not None else "",
-                "mother_phone": mother_phone,
-                "father_name": str(row[idx["father_name"]] or "").strip() if idx["father_name"] is not None else "",
-                "father_phone": father_phone,
-                "siblings": str(row[idx["siblings"]] or "").strip() if idx["siblings"] is not None else "",
-                "boarding_method": boarding_method,
-                "boarding_vehicle": boarding_vehicle,
-                "boarding_location": boarding_loc,
-                "main_parent_phone": main_parent_phone,
-                "dropoff": dropoff,
-            }
-        )
-
-        addr = str(row[idx["address"]] or "").strip() if idx["address"] is not None else ""
-        if addr and ("구" not in addr):
-            errors.append(
-                {
-                    "row": r,
-                    "name": str(name),
-                    "field": "주소",
-                    "value": addr,
-                    "issue": "구(區) 정보 누락 의심",
-                }
-            )
 
+def build_student_records(ws, plan=None, plan_dir=None):
+    errors = []
+    records = list(iter_student_records(ws.iter_rows(values_only=True), errors, plan, plan_dir))
     return records, errors
 
 
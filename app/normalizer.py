@@ -1,12 +1,19 @@
 ﻿import datetime as dt
 import re
 
+import numpy as np
+import pandas as pd
+
+_CHOICE_PREFIX_RE = re.compile(r"^\d+\s*[.)]\s*")
+_NON_DIGIT_RE = re.compile(r"\D")
+_KOREAN_DATE_RE = re.compile(r"^\s*(\d{2,4})\D+(\d{1,2})\D+(\d{1,2})\D*$")
+
 
 def clean_choice_prefix(value):
     if value in (None, ""):
         return ""
     s = str(value).strip()
-    s = re.sub(r"^\d+\s*[.)]\s*", "", s)
+    s = _CHOICE_PREFIX_RE.sub("", s)
     s = s.replace("베내시티", "베네시티")
     return s.strip()
 
@@ -16,11 +23,11 @@ def normalize_date(value):
         return None, "생년월일 미입력"
 
     s = str(value).strip()
-    digits = re.sub(r"\D", "", s)
+    digits = _NON_DIGIT_RE.sub("", s)
 
     try:
         # Korean-style date strings: 15년1월19일, 2015년 1월 19일
-        m = re.match(r"^\s*(\d{2,4})\D+(\d{1,2})\D+(\d{1,2})\D*$", s)
+        m = _KOREAN_DATE_RE.match(s)
         if m:
             y = int(m.group(1))
             if y < 100:
@@ -57,7 +64,7 @@ def normalize_phone(value):
         return "", "전화번호 미입력"
 
     s = str(value).strip()
-    nums = re.sub(r"\D", "", s)
+    nums = _NON_DIGIT_RE.sub("", s)
 
     if nums.startswith("010"):
         if len(nums) == 11:
@@ -78,3 +85,108 @@ def normalize_phone(value):
         return f"{nums[:3]}-{nums[3:6]}-{nums[6:]}", None
 
     return s, "전화번호 형식 불일치"
+
+
+# Column-at-a-time variants. Each takes a whole column (Series or list) and returns
+# (values, errors) Series aligned to the input, with errors None where the scalar
+# function would report no issue, so errors.notna() is the error mask.
+
+
+def _as_object_series(values):
+    if isinstance(values, pd.Series):
+        return values.astype(object)
+    return pd.Series(list(values), dtype=object)
+
+
+def _missing_mask(s):
+    return s.isna() | s.map(lambda v: isinstance(v, str) and v == "")
+
+
+def clean_choice_prefix_series(values):
+    s = _as_object_series(values)
+    missing = _missing_mask(s)
+    text = s.astype(str).str.strip()
+    text = text.str.replace(_CHOICE_PREFIX_RE, "", regex=True)
+    text = text.str.replace("베내시티", "베네시티", regex=False).str.strip()
+    return text.mask(missing, "").astype(object)
+
+
+def normalize_phone_series(values):
+    s = _as_object_series(values)
+    missing = _missing_mask(s).to_numpy()
+    text = s.astype(str).str.strip()
+    nums = text.str.replace(_NON_DIGIT_RE, "", regex=True)
+    n = nums.str.len().to_numpy()
+    mobile = nums.str.startswith("010").to_numpy()
+    seoul = nums.str.startswith("02").to_numpy()
+
+    f344 = (nums.str[:3] + "-" + nums.str[3:7] + "-" + nums.str[7:]).to_numpy()
+    f334 = (nums.str[:3] + "-" + nums.str[3:6] + "-" + nums.str[6:]).to_numpy()
+    f244 = (nums.str[:2] + "-" + nums.str[2:6] + "-" + nums.str[6:]).to_numpy()
+    f234 = (nums.str[:2] + "-" + nums.str[2:5] + "-" + nums.str[5:]).to_numpy()
+    raw = text.to_numpy()
+
+    # Branch order mirrors normalize_phone.
+    conditions = [
+        missing,
+        mobile & (n == 11),
+        mobile & (n == 10),
+        mobile,
+        seoul & (n == 10),
+        seoul & (n == 9),
+        n == 11,
+        n == 10,
+    ]
+    out = np.select(conditions, ["", f344, f334, raw, f244, f234, f344, f334], default=raw)
+    err = np.select(
+        conditions,
+        ["전화번호 미입력", None, None, "휴대전화 길이 이상", None, None, None, None],
+        default="전화번호 형식 불일치",
+    )
+    return pd.Series(out, index=s.index, dtype=object), pd.Series(err, index=s.index, dtype=object)
+
+
+def _safe_date(y, m, d):
+    try:
+        return dt.date(y, m, d), None
+    except Exception:
+        return None, "생년월일 파싱 실패"
+
+
+def normalize_date_series(values):
+    s = _as_object_series(values)
+    missing = _missing_mask(s)
+    text = s.astype(str).str.strip()
+    digits = text.str.replace(_NON_DIGIT_RE, "", regex=True)
+    n = digits.str.len()
+
+    parts = text.str.extract(_KOREAN_DATE_RE)
+    korean = parts[0].notna() & ~missing
+    six = ~missing & ~korean & (n == 6)
+    eight = ~missing & ~korean & (n == 8)
+
+    out = pd.Series([None] * len(s), index=s.index, dtype=object)
+    err = pd.Series([None] * len(s), index=s.index, dtype=object)
+    err[missing] = "생년월일 미입력"
+
+    if korean.any():
+        ys = parts.loc[korean, 0].astype(int)
+        ys = ys.where(ys >= 100, ys + 2000)
+        ms = parts.loc[korean, 1].astype(int)
+        ds = parts.loc[korean, 2].astype(int)
+        for i, y, m, d in zip(ys.index, ys, ms, ds):
+            out[i], err[i] = _safe_date(y, m, d)
+    if six.any():
+        sel = digits[six]
+        for i, y, m, d in zip(sel.index, sel.str[:2].astype(int) + 2000, sel.str[2:4].astype(int), sel.str[4:6].astype(int)):
+            out[i], err[i] = _safe_date(y, m, d)
+    if eight.any():
+        sel = digits[eight]
+        for i, y, m, d in zip(sel.index, sel.str[:4].astype(int), sel.str[4:6].astype(int), sel.str[6:8].astype(int)):
+            out[i], err[i] = _safe_date(y, m, d)
+
+    # Remaining free-form strings go through the strptime formats one by one.
+    rest = ~missing & ~korean & ~six & ~eight
+    for i in rest[rest].index:
+        out[i], err[i] = normalize_date(s[i])
+    return out, err
@@ -0,0 +1,119 @@
+﻿from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import hashlib
+import json
+import threading
+
+import openpyxl
+
+from .address_api import resolve_addresses
+from .mapper import build_student_records
+from .timing import StageTimer, span
+
+MAX_ENTRIES = 8
+WORKERS = 2
+
+_executor = None
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+
+class SurveyError(ValueError):
+    pass
+
+
+def prefetch_key(data, plan=None, *settings):
+    # The file content plus everything that changes the parsed or resolved result.
+    h = hashlib.sha256(data)
+    h.update(json.dumps(plan, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    h.update(repr(settings).encode("utf-8"))
+    return h.hexdigest()
+
+
+def load_and_resolve(data, plan=None, plan_dir=None, juso_key="", cache=None, index=None):
+    # Everything before rendering: parse the 학생 sheet and resolve the addresses.
+    # The stage timings travel with the result, since this runs on a prefetch thread.
+    timer = StageTimer(phase="prefetch", file=hashlib.sha256(data).hexdigest()[:12])
+    with timer.activate():
+        with span("load"):
+            wb = openpyxl.load_workbook(BytesIO(data), read_only=True, data_only=True)
+        try:
+            if "학생" not in wb.sheetnames:
+                raise SurveyError("설문 파일에 '학생' 시트가 없습니다.")
+            with span("records"):
+                records, errors = build_student_records(wb["학생"], plan=plan, plan_dir=plan_dir)
+        finally:
+            wb.close()
+        if not records:
+            raise SurveyError("학생 데이터를 읽지 못했습니다.")
+
+        api_ok = 0
+        api_fail = 0
+        api_stats = {}
+        if juso_key or index:
+            with span("addresses"):
+                api_ok, api_fail, _, api_stats = resolve_addresses(
+                    records, juso_key, timeout_sec=3, cache=cache, index=index
+                )
+    return {
+        "records": records,
+        "errors": errors,
+        "api_ok": api_ok,
+        "api_fail": api_fail,
+        "api_stats": api_stats,
+        "api_on": bool(juso_key or index),
+        "timings": timer.rows(),
+    }
+
+
+def start_prefetch(key, data, **options):
+    # Start load_and_resolve in the background unless this key is already running or
+    # done. The last MAX_ENTRIES results are kept; callers must treat them as read-only.
+    global _executor
+    with _lock:
+        if key in _entries:
+            _entries.move_to_end(key)
+            return _entries[key]
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="prefetch")
+        future = _executor.submit(load_and_resolve, data, **options)
+        _entries[key] = future
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+        return future
+
+
+def is_degraded(result):
+    # Addresses left unresolved because the breaker opened or the budget ran out;
+    # worth another try once the API has recovered.
+    stats = result.get("api_stats") or {}
+    return stats.get("breaker") == "open" or bool(stats.get("skipped"))
+
+
+def prefetch_status(key):
+    with _lock:
+        future = _entries.get(key)
+    if future is None:
+        return "none"
+    return "done" if future.done() else "running"
+
+
+def take_prefetch(key, data, **options):
+    # The prefetched result for key, waiting for it if it is still running. A failed
+    # or degraded prefetch is dropped once taken, so the next call tries again.
+    future = start_prefetch(key, data, **options)
+    try:
+        result = future.result()
+    except Exception:
+        _drop(key, future)
+        raise
+    if is_degraded(result):
+        _drop(key, future)
+    return result
+
+
+def _drop(key, future):
+    with _lock:
+        if _entries.get(key) is future:
+            del _entries[key]
@@ -0,0 +1,111 @@
+﻿from contextlib import contextmanager
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import threading
+import tracemalloc
+
+from .timing import reset_traced_peak, traced_peak
+
+TOP_N = 25
+TRACE_FRAMES = 10
+SAMPLE_SEC = 0.02
+SAMPLE_GROWTH = 1.05
+
+
+def profiling_requested():
+    return os.getenv("PROFILE_CONVERSION", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+class _PeakSampler:
+    # Takes a snapshot each time traced memory climbs SAMPLE_GROWTH above the highest
+    # level sampled so far, so the last one shows what was live around the peak
+    # rather than what is left once the run is over.
+    def __init__(self):
+        self.snapshot = None
+        self.level = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(SAMPLE_SEC):
+            self.sample()
+
+    def sample(self):
+        current = tracemalloc.get_traced_memory()[0]
+        if self.snapshot is None or current > self.level * SAMPLE_GROWTH:
+            self.snapshot = tracemalloc.take_snapshot()
+            self.level = current
+
+    def start(self):
+        self.sample()
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.sample()
+
+
+_NOISE = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, threading.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def _allocation_report(start, at_peak, level, peak, top_n):
+    # Growth between the snapshot taken on entry and the one nearest the peak, by
+    # source line (file:line, size, count); no values from the survey end up here.
+    stats = at_peak.filter_traces(_NOISE).compare_to(start.filter_traces(_NOISE), "lineno")
+    stats = sorted((s for s in stats if s.size_diff > 0), key=lambda s: s.size_diff, reverse=True)
+    lines = [
+        f"peak traced memory: {peak / 1024 / 1024:.1f} MiB",
+        f"snapshot at {level / 1024 / 1024:.1f} MiB; top {top_n} allocations made during the run and live then:",
+    ]
+    for stat in stats[:top_n]:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size_diff / 1024:10.1f} KiB {stat.count_diff:8d} blocks  {frame.filename}:{frame.lineno}")
+    return "\n".join(lines) + "\n"
+
+
+def _profile_summary(profiler, top_n):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top_n)
+    return out.getvalue()
+
+
+@contextmanager
+def profiled(top_n=TOP_N):
+    # Runs the block under cProfile (this thread) and tracemalloc (all threads). The
+    # yielded dict is filled on exit with "pstats" (bytes in the format
+    # pstats.Stats.dump_stats writes, readable with pstats.Stats(path)), "summary"
+    # (top functions by cumulative time), "allocations" (top-N report of what was
+    # allocated and live near the peak) and "peak_kb". StageTimer spans opened
+    # inside record their own peak_kb.
+    capture = {}
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(TRACE_FRAMES)
+    reset_traced_peak()
+    start = tracemalloc.take_snapshot()
+    sampler = _PeakSampler()
+    sampler.start()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield capture
+    finally:
+        profiler.disable()
+        sampler.stop()
+        peak = traced_peak()
+        if started_tracing:
+            tracemalloc.stop()
+        profiler.create_stats()
+        capture["pstats"] = marshal.dumps(profiler.stats)
+        capture["summary"] = _profile_summary(profiler, top_n)
+        capture["allocations"] = _allocation_report(start, sampler.snapshot, sampler.level, peak, top_n)
+        capture["peak_kb"] = round(peak / 1024)
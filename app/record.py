@@ -0,0 +1,82 @@
+﻿WEEKDAYS = ["월요일", "화요일", "수요일", "목요일", "금요일"]
+DROPOFF_FIELDS = ("method", "time", "vehicle", "location")
+EMPTY_DROPOFF = ("", "", "", "")
+
+RECORD_FIELDS = (
+    "row",
+    "name",
+    "grade_text",
+    "class_text",
+    "grade_num",
+    "class_num",
+    "number",
+    "birth_date",
+    "birth_raw",
+    "address",
+    "address_raw",
+    "mother_name",
+    "mother_phone",
+    "father_name",
+    "father_phone",
+    "siblings",
+    "boarding_method",
+    "boarding_vehicle",
+    "boarding_location",
+    "main_parent_phone",
+)
+
+_MAPPING_KEYS = RECORD_FIELDS + ("dropoff",)
+_MAPPING_KEY_SET = frozenset(_MAPPING_KEYS)
+
+
+class StudentRecord:
+    # One student row. The weekday dropoff answers are kept as a 5x4 tuple grid
+    # (WEEKDAYS x DROPOFF_FIELDS) instead of nested dicts; the mapping-style
+    # accessors below keep rec["dropoff"][day]["vehicle"] style callers working.
+    __slots__ = RECORD_FIELDS + ("dropoff_grid", "address_api")
+
+    def __init__(self, dropoff_grid=None, address_api=None, **fields):
+        for key in RECORD_FIELDS:
+            setattr(self, key, fields.pop(key, None))
+        if fields:
+            raise TypeError(f"unknown record fields: {', '.join(fields)}")
+        self.dropoff_grid = tuple(dropoff_grid) if dropoff_grid else (EMPTY_DROPOFF,) * len(WEEKDAYS)
+        self.address_api = address_api
+
+    @property
+    def dropoff(self):
+        return {day: dict(zip(DROPOFF_FIELDS, slot)) for day, slot in zip(WEEKDAYS, self.dropoff_grid)}
+
+    @dropoff.setter
+    def dropoff(self, value):
+        self.dropoff_grid = tuple(
+            tuple((value.get(day) or {}).get(f, "") for f in DROPOFF_FIELDS) for day in WEEKDAYS
+        )
+
+    # dict-style compatibility
+    def keys(self):
+        keys = list(_MAPPING_KEYS)
+        if self.address_api is not None:
+            keys.append("address_api")
+        return keys
+
+    def __contains__(self, key):
+        return key in _MAPPING_KEY_SET or (key == "address_api" and self.address_api is not None)
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in _MAPPING_KEY_SET and key != "address_api":
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        return getattr(self, key)
+
+    def __repr__(self):
+        return f"StudentRecord(row={self.row!r}, name={self.name!r}, number={self.number!r})"
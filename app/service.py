@@ -0,0 +1,255 @@
+﻿from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import urllib.parse
+import uuid
+
+from .batch import bundle_to_zip, convert_workbook
+
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+MAX_FINISHED_JOBS = 64
+LATENCY_SAMPLES = 500
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _latency(values):
+    values = list(values)
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3) if values else 0.0,
+        "p50": round(_percentile(values, 0.50), 3),
+        "p95": round(_percentile(values, 0.95), 3),
+        "max": round(max(values), 3) if values else 0.0,
+    }
+
+
+class ConversionService:
+    # Jobs wait in a bounded queue; a fixed number of dispatcher threads each hand
+    # one job at a time to a long-lived process pool, so the workers keep their
+    # compiled templates between jobs. Finished jobs keep their ZIP until
+    # MAX_FINISHED_JOBS newer ones have finished.
+    def __init__(self, workers=2, queue_size=16, **options):
+        self.workers = workers
+        self.options = options
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.jobs = {}
+        self.finished = deque()
+        self.busy = 0
+        self.counts = {"submitted": 0, "rejected": 0, "done": 0, "failed": 0}
+        self.wait_times = deque(maxlen=LATENCY_SAMPLES)
+        self.run_times = deque(maxlen=LATENCY_SAMPLES)
+        self.lock = threading.Lock()
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        self.threads = [threading.Thread(target=self._dispatch, daemon=True) for _ in range(workers)]
+        for t in self.threads:
+            t.start()
+
+    def submit(self, data, label, school_year):
+        # The job dict, or None when the queue is full.
+        job = {
+            "id": uuid.uuid4().hex,
+            "label": label,
+            "school_year": school_year,
+            "status": "queued",
+            "submitted": time.time(),
+            "error": "",
+            "classes": [],
+            "zip": None,
+        }
+        with self.lock:
+            try:
+                self.queue.put_nowait((job, data))
+            except queue.Full:
+                self.counts["rejected"] += 1
+                return None
+            self.jobs[job["id"]] = job
+            self.counts["submitted"] += 1
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _dispatch(self):
+        while True:
+            job, data = self.queue.get()
+            started = time.time()
+            with self.lock:
+                job["status"] = "running"
+                job["started"] = started
+                self.busy += 1
+                self.wait_times.append(started - job["submitted"])
+            try:
+                results = self.pool.submit(
+                    convert_workbook, data, job["school_year"], label=job["label"], **self.options
+                ).result()
+                if not results:
+                    raise ValueError("학생 시트를 찾지 못했습니다.")
+                classes = [
+                    {"class": r["class"], "student_count": r.get("student_count", 0), "error": r.get("error", "")}
+                    for r in results
+                ]
+                payload = bundle_to_zip(results, job["school_year"])
+                status, error = "done", ""
+            except Exception as e:
+                classes, payload = [], None
+                status, error = "failed", f"{type(e).__name__}: {e}"
+            finished = time.time()
+            with self.lock:
+                job.update(status=status, error=error, classes=classes, zip=payload, finished=finished)
+                self.busy -= 1
+                self.counts[status] += 1
+                self.run_times.append(finished - started)
+                self.finished.append(job["id"])
+                while len(self.finished) > MAX_FINISHED_JOBS:
+                    self.jobs.pop(self.finished.popleft(), None)
+            self.queue.task_done()
+
+    def metrics(self):
+        with self.lock:
+            return {
+                "queue_depth": self.queue.qsize(),
+                "queue_capacity": self.queue.maxsize,
+                "workers": self.workers,
+                "busy_workers": self.busy,
+                "jobs": dict(self.counts),
+                "queue_wait_sec": _latency(self.wait_times),
+                "run_sec": _latency(self.run_times),
+            }
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def job_view(job):
+    view = {k: v for k, v in job.items() if k != "zip"}
+    view["ready"] = job["zip"] is not None
+    return view
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    # POST /jobs?year=2026&name=학교 (body: survey .xlsx)  -> 202 {"id": ...}
+    # GET  /jobs/<id>                                      -> job status
+    # GET  /jobs/<id>/result                               -> ZIP once done
+    # GET  /metrics                                        -> queue depth and latencies
+    service = None
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        if url.path != "/jobs":
+            return self._send_json(404, {"error": "not found"})
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            return self._send_json(400, {"error": "설문 파일이 비어 있습니다."})
+        if length > MAX_UPLOAD_BYTES:
+            return self._send_json(413, {"error": "설문 파일이 너무 큽니다."})
+        data = self.rfile.read(length)
+
+        query = urllib.parse.parse_qs(url.query)
+        try:
+            school_year = int(query.get("year", [date.today().year])[0])
+        except ValueError:
+            return self._send_json(400, {"error": "year 값이 올바르지 않습니다."})
+        label = query.get("name", [""])[0] or None
+
+        job = self.service.submit(data, label, school_year)
+        if job is None:
+            self.send_response(503)
+            self.send_header("Retry-After", "5")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self._send_json(202, {"id": job["id"], "status": job["status"]})
+
+    def do_GET(self):
+        parts = [p for p in urllib.parse.urlparse(self.path).path.split("/") if p]
+        if parts == ["metrics"]:
+            return self._send_json(200, self.service.metrics())
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.service.get(parts[1])
+            if job is None:
+                return self._send_json(404, {"error": "없는 작업입니다."})
+            if len(parts) == 2:
+                return self._send_json(200, job_view(job))
+            if parts[2] == "result":
+                if job["status"] == "failed":
+                    return self._send_json(409, job_view(job))
+                if job["zip"] is None:
+                    return self._send_json(409, {"id": job["id"], "status": job["status"]})
+                name = urllib.parse.quote(f"{job['school_year']}학년도_{job['label'] or job['id']}_산출물.zip")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/zip")
+                self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{name}")
+                self.send_header("Content-Length", str(len(job["zip"])))
+                self.end_headers()
+                self.wfile.write(job["zip"])
+                return
+        self._send_json(404, {"error": "not found"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host="127.0.0.1", port=8080, workers=2, queue_size=16, **options):
+    service = ConversionService(workers=workers, queue_size=queue_size, **options)
+    handler = type("BoundServiceHandler", (ServiceHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    return server, service
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.service", description="설문 변환 HTTP 서비스")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=2, help="동시에 변환할 작업 수")
+    parser.add_argument("--queue-size", type=int, default=16, help="대기열 길이 (넘치면 503)")
+    parser.add_argument("--roster-template", default="template_roster.xlsx")
+    parser.add_argument("--dropoff-template", default="template_dropoff.xlsx")
+    args = parser.parse_args(argv)
+
+    server, service = serve(
+        args.host,
+        args.port,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        roster_template_path=args.roster_template,
+        dropoff_template_path=args.dropoff_template,
+        juso_key=os.getenv("JUSO_API_KEY", ""),
+        plan_dir=os.getenv("COLUMN_PLAN_DIR", ".column_plans"),
+        address_cache_path=os.getenv("ADDRESS_CACHE_PATH", ".address_cache.sqlite3"),
+        address_backend=os.getenv("ADDRESS_BACKEND", "juso"),
+        address_index_path=os.getenv("ADDRESS_INDEX_PATH", "address_index.bin"),
+    )
+    print(f"http://{args.host}:{server.server_address[1]} (작업자 {args.workers}, 대기열 {args.queue_size})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+﻿from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import logging
+import time
+import tracemalloc
+
+logger = logging.getLogger("app.timing")
+
+_active = ContextVar("timing_active", default=None)
+_high_water = [0]
+
+
+def reset_traced_peak():
+    # tracemalloc.reset_peak for callers that want the overall peak; spans reset
+    # tracemalloc's own peak, so read it back with traced_peak().
+    _high_water[0] = 0
+    tracemalloc.reset_peak()
+
+
+def traced_peak():
+    return max(_high_water[0], tracemalloc.get_traced_memory()[1])
+
+
+class StageTimer:
+    # Collects the spans opened while it is active. Nested spans get dotted names
+    # ("roster.save"); every finished span is also logged as one JSON line carrying
+    # the timer's context fields, e.g. {"event": "stage", "stage": "roster", "ms": 52.1,
+    # "class": "4-1"}. While tracemalloc is tracing, spans also record peak_kb: how
+    # far traced memory rose inside them above where it stood when they began.
+    def __init__(self, **context):
+        self.context = context
+        self.spans = []
+
+    @contextmanager
+    def activate(self):
+        token = _active.set((self, "", [0]))
+        try:
+            yield self
+        finally:
+            _active.reset(token)
+
+    def rows(self):
+        return [dict(s) for s in self.spans]
+
+
+@contextmanager
+def span(name, **fields):
+    # Times the block on the active StageTimer; without one it does nothing, so
+    # library code can open spans unconditionally.
+    state = _active.get()
+    if state is None:
+        yield
+        return
+
+    timer, parent, parent_peak = state
+    stage = f"{parent}.{name}" if parent else name
+    entry = {"stage": stage, "ms": None, **fields}
+    timer.spans.append(entry)
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        # Hand the peak so far to the parent, then measure this span from zero.
+        base, so_far = tracemalloc.get_traced_memory()
+        parent_peak[0] = max(parent_peak[0], so_far)
+        _high_water[0] = max(_high_water[0], so_far)
+        tracemalloc.reset_peak()
+    peak = [0]
+    token = _active.set((timer, stage, peak))
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        entry["ms"] = round((time.perf_counter() - started) * 1000, 1)
+        if tracing and tracemalloc.is_tracing():
+            peak[0] = max(peak[0], tracemalloc.get_traced_memory()[1])
+            entry["peak_kb"] = round(max(0, peak[0] - base) / 1024)
+            parent_peak[0] = max(parent_peak[0], peak[0])
+        _active.reset(token)
+        logger.info(json.dumps({"event": "stage", **timer.context, **entry}, ensure_ascii=False, default=str))
@@ -0,0 +1,186 @@
+﻿from contextlib import contextmanager
+from datetime import datetime
+from io import BytesIO
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+
+import openpyxl
+from openpyxl.workbook.workbook import Workbook
+
+from app.builders import build_boarding_report, build_dropoff_result, build_student_roster
+from app.builders.build_emergency_copy import build_emergency_copy
+from app.columnar import build_cube
+from app.mapper import iter_student_records
+from app.normalizer import clean_choice_prefix_series, normalize_date_series, normalize_phone_series
+
+from .synthetic import generate_survey
+
+DEFAULT_SIZES = [30, 300, 3000, 10000]
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), "results.jsonl")
+REGRESSION_RATIO = 1.2
+NOISE_FLOOR_SEC = 0.01
+
+
+class _SaveTimer:
+    # Time spent inside Workbook.save while it is installed, so each builder's
+    # rendering and serialization can be reported apart.
+    def __init__(self):
+        self.total = 0.0
+
+    @contextmanager
+    def installed(self):
+        original = Workbook.save
+        timer = self
+
+        def save(wb, filename):
+            started = time.perf_counter()
+            try:
+                return original(wb, filename)
+            finally:
+                timer.total += time.perf_counter() - started
+
+        Workbook.save = save
+        try:
+            yield self
+        finally:
+            Workbook.save = original
+
+
+def _timed(stages, name, fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    stages[name] = time.perf_counter() - started
+    return result
+
+
+def _timed_builder(stages, name, fn, *args, **kwargs):
+    timer = _SaveTimer()
+    with timer.installed():
+        result = _timed(stages, name, fn, *args, **kwargs)
+    stages[f"{name}.save"] = timer.total
+    return result
+
+
+def run_once(data, school_year=2026):
+    stages = {}
+    started = time.perf_counter()
+    wb = _timed(stages, "load", openpyxl.load_workbook, BytesIO(data), read_only=True, data_only=True)
+    rows = _timed(stages, "read_rows", lambda: [tuple(r) for r in wb["학생"].iter_rows(values_only=True)])
+    wb.close()
+
+    headers, body = list(rows[0]), rows[1:]
+    columns = {
+        name: [r[headers.index(header)] for r in body]
+        for name, header in (("phone", "어머니의 전화번호"), ("birth", "생년월일"), ("choice", "(등교)_등교 방법"))
+    }
+    _timed(stages, "normalize.phone", normalize_phone_series, columns["phone"])
+    _timed(stages, "normalize.date", normalize_date_series, columns["birth"])
+    _timed(stages, "normalize.choice", clean_choice_prefix_series, columns["choice"])
+
+    errors = []
+    records = _timed(stages, "mapper", lambda: list(iter_student_records(rows, errors)))
+    cube = _timed(stages, "cube", build_cube, records)
+    _timed_builder(
+        stages, "roster", build_student_roster, records, school_year, default_template_path="template_roster.xlsx"
+    )
+    _timed_builder(
+        stages, "dropoff", build_dropoff_result, records, default_template_path="template_dropoff.xlsx", cube=cube
+    )
+    _timed_builder(stages, "boarding", build_boarding_report, records, cube=cube)
+    _timed_builder(stages, "emergency", build_emergency_copy, records, cube=cube)
+    stages["total"] = time.perf_counter() - started
+    return stages
+
+
+def run_suite(sizes, repeat=3, seed=0):
+    # Median seconds per stage for each survey size; one warm-up run per size first,
+    # so template compilation and imports are not counted.
+    out = {}
+    for size in sizes:
+        data = generate_survey(size, seed=seed)
+        run_once(data)
+        runs = [run_once(data) for _ in range(repeat)]
+        out[str(size)] = {name: round(statistics.median(r[name] for r in runs), 5) for name in runs[0]}
+    return out
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def load_results(path=RESULTS_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def compare(current, previous, ratio=REGRESSION_RATIO):
+    # [(size, stage, previous, current)] for stages at least `ratio` times slower;
+    # stages under NOISE_FLOOR_SEC are too short to compare.
+    slower = []
+    for size, stages in current.items():
+        before = previous.get(size, {})
+        for name, sec in stages.items():
+            if name in before and before[name] >= NOISE_FLOOR_SEC and sec >= before[name] * ratio:
+                slower.append((size, name, before[name], sec))
+    return slower
+
+
+def _print_table(results, previous):
+    names = list(next(iter(results.values())))
+    sizes = list(results)
+    print("stage".ljust(18) + "".join(f"{s + '명':>14}" for s in sizes))
+    for name in names:
+        cells = []
+        for size in sizes:
+            sec = results[size][name]
+            before = (previous or {}).get(size, {}).get(name)
+            delta = f"{(sec / before - 1) * 100:+.0f}%" if before else ""
+            cells.append(f"{sec:.3f} {delta}".strip())
+        print(name.ljust(18) + "".join(f"{c:>14}" for c in cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="단계별 변환 벤치마크")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="학생 수")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--results", default=RESULTS_PATH, help="결과를 쌓아 둘 JSONL 파일")
+    parser.add_argument("--no-save", action="store_true", help="결과를 저장하지 않음")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.sizes, repeat=args.repeat, seed=args.seed)
+    history = load_results(args.results)
+    previous = history[-1]["results"] if history else None
+    _print_table(results, previous)
+
+    if previous:
+        for size, name, before, sec in compare(results, previous):
+            print(f"느려짐: {size}명 {name} {before:.3f}s -> {sec:.3f}s")
+
+    if not args.no_save:
+        entry = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "openpyxl": openpyxl.__version__,
+            "repeat": args.repeat,
+            "results": results,
+        }
+        with open(args.results, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
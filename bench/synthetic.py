@@ -0,0 +1,142 @@
+﻿from io import BytesIO
+import random
+
+import openpyxl
+
+from app.record import WEEKDAYS
+
+SHORT_DAYS = {"월요일": "월", "화요일": "화", "수요일": "수", "목요일": "목", "금요일": "금"}
+VEHICLES = ["1호차", "2호차", "3호차", "5호차", "7호차", "11호차", "12호차"]
+STOPS = ["1. 센텀시티역", "2) 벡스코 앞", "해운대역", "마린시티 입구", "광안리 해변", "좌동 재래시장", "장산역 3번 출구"]
+ROADS = [
+    ("해운대구", "센텀동로", 25, "센텀파크"),
+    ("해운대구", "좌동로", 63, "대림1차아파트"),
+    ("해운대구", "마린시티2로", 33, "두산위브더제니스"),
+    ("수영구", "광안해변로", 418, "삼익비치"),
+    ("해운대구", "달맞이길", 43, "이안해운대파일론"),
+    ("해운대구", "해운대로570번길", 12, ""),
+]
+SIBLING_ANSWERS = ["없음", "없 음.", "", "해당없음", "2-3 김민준", "6학년 1반 형"]
+
+
+def _phone(rng, messy):
+    digits = f"010{rng.randint(0, 99999999):08d}"
+    if rng.random() >= messy:
+        return f"{digits[:3]}-{digits[3:7]}-{digits[7:]}"
+    return rng.choice(
+        [digits, f"{digits[:3]} {digits[3:7]} {digits[7:]}", "051-123-4567", "0512345678", "12345", "", None]
+    )
+
+
+def _birth(rng, messy, school_year):
+    year = school_year - rng.randint(7, 12)
+    month, day = rng.randint(1, 12), rng.randint(1, 28)
+    if rng.random() >= messy:
+        return f"{year}-{month:02d}-{day:02d}"
+    return rng.choice(
+        [
+            f"{year % 100:02d}{month:02d}{day:02d}",
+            f"{year}{month:02d}{day:02d}",
+            f"{year % 100}년{month}월{day}일",
+            f"{year}.{month:02d}.{day:02d}",
+            f"{year}/02/30",
+            "모름",
+            None,
+        ]
+    )
+
+
+def _address(rng, messy):
+    gu, road, number, building = rng.choice(ROADS)
+    dong, ho = rng.randint(101, 112), rng.randint(1, 35) * 100 + rng.randint(1, 4)
+    if rng.random() >= messy:
+        return f"부산광역시 {gu} {road} {number}, {dong}동 {ho}호"
+    return rng.choice(
+        [
+            f"부산시 {gu} {road} {number}, {dong}-{ho}",
+            f"{gu} {road}{number} {building} {dong}동{ho}호",
+            f"{road} {number} ({building}) {ho}호",
+            f"{building} {dong}동 {ho}호",
+            "",
+        ]
+    )
+
+
+def survey_headers(days=WEEKDAYS, slots=(1, 2, 3)):
+    headers = [
+        "타임스탬프",
+        "학생이름",
+        "학년",
+        "반",
+        "번호",
+        "생년월일",
+        "주소(도로명주소)",
+        "어머니 성명",
+        "어머니의 전화번호",
+        "아버지 성명",
+        "아버지의 전화번호",
+        "형제가 있다면 적어주세요",
+        "(등교)_등교 방법",
+        "(등교)_등교 탑승 차량",
+        "(등교)_등교 승차 장소",
+    ]
+    for day in days:
+        headers += [f"({day})_하교 방법", f"({day})_하교 시간"]
+        for slot in slots:
+            headers += [f"({SHORT_DAYS[day]},{slot}하교)_탑승 차량", f"({SHORT_DAYS[day]},{slot}하교)_하차 장소"]
+    headers.append("주 학부모전화번호")
+    return headers
+
+
+def survey_rows(students, days=WEEKDAYS, slots=(1, 2, 3), messy=0.2, bus_share=0.6, seed=0, school_year=2026):
+    # One 학생 sheet row per student, in survey_headers order. Numbers follow the
+    # roster layout (boys from 1, girls from 41); `messy` is the share of phones,
+    # dates and addresses written in one of the free-form variants the normalizers
+    # have to cope with, and of numbers typed as text.
+    rng = random.Random(seed)
+    for i in range(students):
+        number = (i // 2) % 20 + (1 if i % 2 == 0 else 41)
+        row = [
+            f"{school_year}/03/0{rng.randint(2, 9)} 8:{rng.randint(10, 59)}:00",
+            f"학생{i:05d}",
+            rng.choice(["4", "4학년"]),
+            rng.choice(["4", "4반"]),
+            f"{number}번" if rng.random() < messy else number,
+            _birth(rng, messy, school_year),
+            _address(rng, messy),
+            f"어머니{i}",
+            _phone(rng, messy),
+            f"아버지{i}",
+            _phone(rng, messy),
+            rng.choice(SIBLING_ANSWERS),
+        ]
+        if rng.random() < bus_share:
+            row += ["1. 학교차량이용", rng.choice(VEHICLES), rng.choice(STOPS)]
+        else:
+            row += [rng.choice(["2. 도보", "3. 자가용"]), None, None]
+        for _ in days:
+            rides = rng.random() < bus_share
+            slot = rng.choice(slots)
+            row += ["1. 학교차량이용" if rides else rng.choice(["2. 도보", "3. 학원차량", ""])]
+            row += [f"{slot}하교 (1{slot + 2}:{rng.choice(['00', '30'])})" if rng.random() > messy / 4 else ""]
+            for s in slots:
+                if rides and s == slot:
+                    row += [rng.choice(VEHICLES), rng.choice(STOPS)]
+                else:
+                    row += [None, None]
+        row.append(_phone(rng, messy))
+        yield row
+
+
+def generate_survey(students, days=WEEKDAYS, slots=(1, 2, 3), messy=0.2, bus_share=0.6, seed=0, school_year=2026):
+    # A survey workbook (.xlsx bytes) with a 학생 sheet plus an unrelated sheet, like
+    # the form exports teachers upload.
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("학생")
+    ws.append(survey_headers(days, slots))
+    for row in survey_rows(students, days, slots, messy, bus_share, seed, school_year):
+        ws.append(row)
+    wb.create_sheet("설문 정보").append(["응답 수", students])
+    out = BytesIO()
+    wb.save(out)
+    return out.getvalue()
@@ -1,12 +1,26 @@
-﻿from io import BytesIO
+﻿from contextlib import nullcontext
 from datetime import date
+import json
+import logging
 import os
 
-import openpyxl
+import pandas as pd
 import streamlit as st
 
-from app.address_api import resolve_addresses
-from app.mapper import build_student_records
+from app.address_cache import AddressCache
+from app.address_index import select_backend
+from app.batch import bundle_to_zip, convert_classes, read_class_sheets, unique_labels
+from app.columnar import build_cube
+from app.timing import StageTimer, span
+from app.prefetch import (
+    SurveyError,
+    load_and_resolve,
+    prefetch_key,
+    prefetch_status,
+    start_prefetch,
+    take_prefetch,
+)
+from app.profiling import profiled, profiling_requested
 from app.validator import build_validation_frame
 from app.builders import (
     build_boarding_report,
@@ -16,6 +30,19 @@ from app.builders import (
 
 DEFAULT_ROSTER_TEMPLATE = "template_roster.xlsx"
 DEFAULT_VEHICLE_TEMPLATE = "template_dropoff.xlsx"
+COLUMN_PLAN_DIR = os.getenv("COLUMN_PLAN_DIR", ".column_plans")
+ADDRESS_CACHE_PATH = os.getenv("ADDRESS_CACHE_PATH", ".address_cache.sqlite3")
+ADDRESS_BACKEND = os.getenv("ADDRESS_BACKEND", "juso")
+ADDRESS_INDEX_PATH = os.getenv("ADDRESS_INDEX_PATH", "address_index.bin")
+
+# Stage timings go out as JSON log lines (logger "app.timing") for monitoring. Only
+# that logger is set up, so other libraries keep their own levels. The script reruns
+# on every interaction, hence the handler check.
+_timing_logger = logging.getLogger("app.timing")
+_timing_logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+if not _timing_logger.handlers:
+    _timing_logger.addHandler(logging.StreamHandler())
+    _timing_logger.propagate = False
 
 
 def _safe_secret(key, default=""):
@@ -25,6 +52,11 @@ def _safe_secret(key, default=""):
         return default
 
 
+@st.cache_resource
+def _address_cache():
+    return AddressCache(ADDRESS_CACHE_PATH)
+
+
 st.set_page_config(page_title="등하교 설문 변환기", layout="wide")
 st.title("등하교 설문 변환기")
 st.caption("설문 엑셀 업로드 -> 산출물 엑셀 다운로드")
@@ -38,6 +70,43 @@ with col1:
 with col2:
     school_year = st.number_input("학년도", min_value=2020, max_value=2100, value=date.today().year)
 
+with st.expander("고급 설정"):
+    plan_file = st.file_uploader("컬럼 매핑 파일(.json, 선택)", type=["json"], key="column_plan")
+    # Profiling is switched on with PROFILE_CONVERSION=1, or from this checkbox, which
+    # only shows when the page is opened with ?profile=1.
+    profile_run = profiling_requested()
+    if st.query_params.get("profile") == "1":
+        profile_run = st.checkbox("성능 프로파일 수집 (cProfile / tracemalloc)", value=profile_run, key="profile_run")
+
+# Parsing and address lookup start in the background as soon as a file is uploaded;
+# the run button then only waits for whatever is left and renders.
+survey_key = None
+if survey_file:
+    try:
+        plan = json.loads(plan_file.getvalue().decode("utf-8")) if plan_file else None
+    except ValueError:
+        st.error("컬럼 매핑 파일을 읽지 못했습니다.")
+        st.stop()
+    juso_key, address_index = select_backend(
+        ADDRESS_BACKEND, os.getenv("JUSO_API_KEY") or _safe_secret("JUSO_API_KEY", ""), ADDRESS_INDEX_PATH
+    )
+    survey_bytes = survey_file.getvalue()
+    prefetch_options = {
+        "plan": plan,
+        "plan_dir": COLUMN_PLAN_DIR,
+        "juso_key": juso_key,
+        "cache": _address_cache(),
+        "index": address_index,
+    }
+    survey_key = prefetch_key(survey_bytes, plan, COLUMN_PLAN_DIR, juso_key, ADDRESS_BACKEND, ADDRESS_INDEX_PATH)
+    # A profiled run parses on the script thread, so the profile covers every stage.
+    if not profile_run:
+        start_prefetch(survey_key, survey_bytes, **prefetch_options)
+        if prefetch_status(survey_key) == "running":
+            st.caption("설문 파일을 미리 읽고 주소를 조회하는 중입니다.")
+        else:
+            st.caption("설문 파일 준비 완료: 변환 실행 시 바로 산출물을 만듭니다.")
+
 run = st.button("변환 실행", type="primary", use_container_width=True)
 
 if run:
@@ -46,50 +115,66 @@ if run:
         st.stop()
 
     try:
-        wb = openpyxl.load_workbook(BytesIO(survey_file.read()), data_only=True)
-        if "학생" not in wb.sheetnames:
-            st.error("설문 파일에 '학생' 시트가 없습니다.")
-            st.stop()
+        with (profiled() if profile_run else nullcontext()) as capture:
+            try:
+                if profile_run:
+                    loaded = load_and_resolve(survey_bytes, **prefetch_options)
+                else:
+                    loaded = take_prefetch(survey_key, survey_bytes, **prefetch_options)
+            except SurveyError as e:
+                st.error(str(e))
+                st.stop()
+            records = loaded["records"]
+            # The prefetched result is shared between reruns; the roster appends to errors.
+            errors = list(loaded["errors"])
+            api_ok = loaded["api_ok"]
+            api_fail = loaded["api_fail"]
+            api_stats = loaded["api_stats"]
 
-        records, errors = build_student_records(wb["학생"])
-        if not records:
-            st.error("학생 데이터를 읽지 못했습니다.")
-            st.stop()
+            timer = StageTimer(phase="render", file=survey_key[:12], students=len(records))
+            with timer.activate():
+                with span("roster"):
+                    out1 = build_student_roster(
+                        records,
+                        school_year=school_year,
+                        template_bytes=None,
+                        default_template_path=DEFAULT_ROSTER_TEMPLATE,
+                        errors=errors,
+                    )
+                df_err = build_validation_frame(errors)
 
-        juso_key = os.getenv("JUSO_API_KEY") or _safe_secret("JUSO_API_KEY", "")
-        api_ok = 0
-        api_fail = 0
-        if juso_key:
-            api_ok, api_fail, _ = resolve_addresses(records, juso_key, timeout_sec=3)
+                with span("cube"):
+                    cube = build_cube(records)
 
-        df_err = build_validation_frame(errors)
+                with span("dropoff"):
+                    out2 = build_dropoff_result(
+                        records,
+                        template_bytes=None,
+                        default_template_path=DEFAULT_VEHICLE_TEMPLATE,
+                        cube=cube,
+                    )
 
-        out1 = build_student_roster(
-            records,
-            school_year=school_year,
-            template_bytes=None,
-            default_template_path=DEFAULT_ROSTER_TEMPLATE,
-        )
+                with span("boarding"):
+                    out3 = build_boarding_report(records, cube=cube)
 
-        out2 = build_dropoff_result(
-            records,
-            template_bytes=None,
-            default_template_path=DEFAULT_VEHICLE_TEMPLATE,
-        )
+            timings = [{**t, "phase": "업로드 시 미리 처리"} for t in loaded["timings"]]
+            timings += [{**t, "phase": "변환 실행"} for t in timer.rows()]
 
-        out3 = build_boarding_report(records)
-
-        st.session_state.result_bundle = {
-            "school_year": school_year,
-            "student_count": len(records),
-            "df_err": df_err,
-            "out1": out1,
-            "out2": out2,
-            "out3": out3,
-            "api_ok": api_ok,
-            "api_fail": api_fail,
-            "api_on": bool(juso_key),
-        }
+            st.session_state.result_bundle = {
+                "school_year": school_year,
+                "student_count": len(records),
+                "df_err": df_err,
+                "out1": out1,
+                "out2": out2,
+                "out3": out3,
+                "api_ok": api_ok,
+                "api_fail": api_fail,
+                "api_stats": api_stats,
+                "api_on": loaded["api_on"],
+                "timings": timings,
+            }
+        if capture is not None:
+            st.session_state.result_bundle["profile"] = capture
 
     except Exception as e:
         st.exception(e)
@@ -101,11 +186,61 @@ if bundle:
     st.write(f"경고 수: {len(bundle['df_err'])}건")
     if bundle.get("api_on"):
         st.write(f"주소 API 적용: 성공 {bundle.get('api_ok', 0)}건 / 실패 {bundle.get('api_fail', 0)}건")
+        api_stats = bundle.get("api_stats") or {}
+        if api_stats.get("offline_hits"):
+            st.write(f"오프라인 주소 색인 적중: {api_stats['offline_hits']}건")
+        st.write(
+            f"주소 캐시: 고유 주소 {api_stats.get('lookup_keys', 0)}건 중 "
+            f"적중 {api_stats.get('cache_hits', 0)}건 / 조회 {api_stats.get('cache_misses', 0)}건"
+        )
+        if api_stats.get("breaker") == "open":
+            st.warning(
+                f"주소 API 차단기: 열림 (연속 실패 {api_stats.get('consecutive_failures', 0)}회). "
+                f"{api_stats.get('skipped', 0)}건은 규칙 기반 주소로 대체했습니다."
+            )
+        elif api_stats.get("budget_exceeded"):
+            st.warning(f"주소 조회 시간 초과: {api_stats.get('skipped', 0)}건은 규칙 기반 주소로 대체했습니다.")
+        else:
+            st.write("주소 API 차단기: 닫힘")
     else:
-        st.info("주소 API 키가 없어 규칙 기반 주소 정규화만 적용했습니다.")
+        st.info("주소 API 키나 오프라인 주소 색인이 없어 규칙 기반 주소 정규화만 적용했습니다.")
     if not bundle["df_err"].empty:
         st.dataframe(bundle["df_err"], use_container_width=True, height=240)
 
+    if bundle.get("timings"):
+        with st.expander("단계별 소요 시간"):
+            columns = ["phase", "stage", "ms"]
+            if any("peak_kb" in t for t in bundle["timings"]):
+                columns.append("peak_kb")
+            st.dataframe(
+                pd.DataFrame(bundle["timings"], columns=columns).rename(
+                    columns={"phase": "구분", "stage": "단계", "ms": "소요(ms)", "peak_kb": "메모리 증가 최대(KiB)"}
+                ),
+                use_container_width=True,
+                hide_index=True,
+            )
+
+    profile = bundle.get("profile")
+    if profile:
+        with st.expander("성능 프로파일"):
+            st.write(f"최대 추적 메모리: {profile['peak_kb'] / 1024:.1f} MiB")
+            st.code(profile["summary"])
+            st.code(profile["allocations"])
+            st.download_button(
+                "pstats 파일 다운로드",
+                data=profile["pstats"],
+                file_name="conversion.pstats",
+                mime="application/octet-stream",
+                key="dl_pstats",
+            )
+            st.download_button(
+                "메모리 할당 보고서 다운로드",
+                data=profile["allocations"].encode("utf-8"),
+                file_name="allocations.txt",
+                mime="text/plain",
+                key="dl_alloc",
+            )
+
     st.subheader("다운로드")
     st.download_button(
         "1) 학생일람표 다운로드",
@@ -139,3 +274,82 @@ if bundle:
         )
 
     st.success("변환 결과가 준비되었습니다. 다운로드 버튼을 순서대로 눌러도 화면이 유지됩니다.")
+
+st.divider()
+st.subheader("학교 전체 일괄 변환")
+st.caption("학급별 시트가 담긴 통합 파일 또는 학급별 설문 파일 여러 개를 한 번에 변환합니다.")
+
+if "batch_bundle" not in st.session_state:
+    st.session_state.batch_bundle = None
+
+batch_files = st.file_uploader("학급별 설문 파일(.xlsx, 여러 개 선택 가능)", type=["xlsx"], accept_multiple_files=True, key="batch")
+run_batch = st.button("일괄 변환 실행", use_container_width=True)
+
+if run_batch:
+    if not batch_files:
+        st.error("설문 파일을 먼저 업로드하세요.")
+        st.stop()
+
+    try:
+        # With several uploads each file gets its own folder in the ZIP, so files with
+        # the same sheet names (or the same file name) do not overwrite each other.
+        class_sheets = []
+        folders = []
+        file_labels = unique_labels([os.path.splitext(f.name)[0] for f in batch_files])
+        for f, label in zip(batch_files, file_labels):
+            for name, rows in read_class_sheets(f.getvalue(), label=label):
+                class_sheets.append((name, rows))
+                folders.append(name if len(batch_files) == 1 or name == label else f"{label}/{name}")
+        if not class_sheets:
+            st.error("학생 시트를 찾지 못했습니다.")
+            st.stop()
+
+        with st.spinner(f"{len(class_sheets)}개 학급 변환 중..."):
+            results = convert_classes(
+                class_sheets,
+                school_year,
+                roster_template_path=DEFAULT_ROSTER_TEMPLATE,
+                dropoff_template_path=DEFAULT_VEHICLE_TEMPLATE,
+                juso_key=os.getenv("JUSO_API_KEY") or _safe_secret("JUSO_API_KEY", ""),
+                plan_dir=COLUMN_PLAN_DIR,
+                address_cache_path=ADDRESS_CACHE_PATH,
+                address_backend=ADDRESS_BACKEND,
+                address_index_path=ADDRESS_INDEX_PATH,
+            )
+        for res, folder in zip(results, folders):
+            res["folder"] = folder
+
+        st.session_state.batch_bundle = {
+            "school_year": school_year,
+            "summary": pd.DataFrame(
+                [
+                    {
+                        "학급": r["class"],
+                        "학생 수": r.get("student_count", 0),
+                        "경고 수": len(r.get("errors", [])),
+                        "주소 성공": r.get("api_ok", 0),
+                        "주소 실패": r.get("api_fail", 0),
+                        "캐시 적중": r.get("cache_hits", 0),
+                        "주소 차단기": r.get("breaker", ""),
+                        "주소 건너뜀": r.get("address_skipped", 0),
+                        "소요(초)": round(r.get("elapsed", 0.0), 2),
+                        "오류": r.get("error", ""),
+                    }
+                    for r in results
+                ]
+            ),
+            "zip": bundle_to_zip(results, school_year),
+        }
+    except Exception as e:
+        st.exception(e)
+
+batch_bundle = st.session_state.batch_bundle
+if batch_bundle:
+    st.dataframe(batch_bundle["summary"], use_container_width=True)
+    st.download_button(
+        "학급별 산출물(zip) 다운로드",
+        data=batch_bundle["zip"],
+        file_name=f"{batch_bundle['school_year']}학년도_학급별_산출물.zip",
+        mime="application/zip",
+        key="dl_batch",
+    )
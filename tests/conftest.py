@@ -0,0 +1,83 @@
+﻿from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+import urllib.parse
+
+import pytest
+
+
+class JusoStub:
+    # Stand-in for the juso.go.kr search API. Knobs: `delay` before every answer,
+    # and `errors[keyword]`, a list of answers to give that keyword first: an HTTP
+    # status (503, 400 ...) or "timeout" to stall for `stall_sec`. It records every
+    # call and the highest number of requests it was serving at once.
+    def __init__(self):
+        self.delay = 0.0
+        self.stall_sec = 1.0
+        self.errors = {}
+        self.calls = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lock = threading.Lock()
+        self.url = ""
+
+    def calls_for(self, keyword):
+        return sum(1 for _, k in self.calls if k == keyword)
+
+
+def _handler(stub):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            keyword = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query).get("keyword", [""])[0]
+            with stub.lock:
+                stub.calls.append((time.monotonic(), keyword))
+                stub.in_flight += 1
+                stub.peak_in_flight = max(stub.peak_in_flight, stub.in_flight)
+                planned = stub.errors.get(keyword) or []
+                answer = planned.pop(0) if planned else 200
+            try:
+                time.sleep(stub.delay)
+                if answer == "timeout":
+                    time.sleep(stub.stall_sec)
+                    answer = 200
+                if answer != 200:
+                    self.send_response(answer)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = json.dumps(
+                    {"results": {"common": {"errorCode": "0"}, "juso": [{"roadAddr": f"{keyword} (도로명)"}]}},
+                    ensure_ascii=False,
+                ).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                with stub.lock:
+                    stub.in_flight -= 1
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+@pytest.fixture
+def juso_stub(monkeypatch):
+    stub = JusoStub()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(stub))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    stub.url = f"http://127.0.0.1:{server.server_address[1]}/addrlink/addrLinkApi.do"
+    monkeypatch.setenv("JUSO_API_URL", stub.url)
+    try:
+        yield stub
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,95 @@
+﻿from types import SimpleNamespace
+
+from app.address_api import _merge_with_detail, address_lookup_key, extract_detail_parts, resolve_addresses
+from app.address_cache import AddressCache
+
+
+def test_lot_numbers_stay_in_the_key():
+    assert address_lookup_key("부산 해운대구 우동 1408-123") == "부산 해운대구 우동 1408-123"
+    assert address_lookup_key("부산 해운대구 우동 1408-123") != address_lookup_key("부산 해운대구 우동 1408-124")
+    assert extract_detail_parts("부산 해운대구 우동 1408-123") == []
+
+
+def test_numbered_dong_names_are_not_units():
+    assert address_lookup_key("서울시 강남구 역삼1동 123-45") == "서울시 강남구 역삼1동 123-45"
+    assert address_lookup_key("서울시 강남구 역삼1동 123-45") != address_lookup_key("서울시 강남구 역삼2동 123-45")
+
+
+def test_dong_ho_pair_after_road_and_building_number():
+    key = address_lookup_key("부산시 해운대구 우2동 센텀동로 25, 102-3602")
+    assert key == "부산광역시 해운대구 우2동 센텀동로 25"
+    assert key == address_lookup_key("부산시 해운대구 우2동 센텀동로 25, 103-1201")
+    assert key != address_lookup_key("부산시 해운대구 우1동 센텀동로 25, 102-3602")
+    parts = extract_detail_parts("부산시 해운대구 우2동 센텀동로 25, 102-3602")
+    assert [(p["dong"], p["ho"]) for p in parts] == [("102", "3602")]
+
+
+def test_building_number_is_not_a_dong_ho_pair():
+    assert address_lookup_key("해운대로 1408-123") == "해운대로 1408-123"
+    assert address_lookup_key("해운대구 해운대로570번길 12 101-1201") == "부산광역시 해운대구 해운대로570번길 12"
+
+
+def test_building_dong_joined_to_the_building_name():
+    raw = "해운대구 센텀파크101동 2604호"
+    assert address_lookup_key(raw) == address_lookup_key("해운대구 센텀파크102동 1101호")
+    assert [(p["dong"], p["ho"]) for p in extract_detail_parts(raw)] == [("101", "2604")]
+    assert _merge_with_detail("부산광역시 해운대구 센텀동로 25", raw).endswith(", 101동2604호")
+
+
+def test_dong_ho_shorthand_after_an_apartment_name():
+    for raw in ("대림1차아파트 101-1201", "해운대구 좌동 대림1차아파트 101-1201"):
+        assert "101-1201" not in address_lookup_key(raw)
+        assert _merge_with_detail("부산광역시 해운대구 좌동로 63", raw).endswith(", 101-1201")
+    assert address_lookup_key("해운대구 좌동 대림1차아파트 101-1201") == address_lookup_key(
+        "해운대구 좌동 대림1차아파트 102-301"
+    )
+
+
+def _records(count):
+    return [
+        SimpleNamespace(name=f"학생{i}", address_raw=f"부산광역시 해운대구 센텀동로 {i + 1}", address_api=None)
+        for i in range(count)
+    ]
+
+
+def _resolve(records, **options):
+    options.setdefault("rate_per_sec", None)
+    options.setdefault("backoff_sec", 0.01)
+    return resolve_addresses(records, "test-key", cache=AddressCache(":memory:"), **options)
+
+
+def test_requests_in_flight_are_capped(juso_stub):
+    juso_stub.delay = 0.05
+    ok, fail, _, _ = _resolve(_records(20), max_in_flight=3)
+    assert (ok, fail) == (20, 0)
+    assert juso_stub.peak_in_flight == 3
+
+
+def test_requests_follow_the_rate_limit(juso_stub):
+    ok, _, _, _ = _resolve(_records(20), rate_per_sec=10)
+    times = sorted(t for t, _ in juso_stub.calls)
+    assert ok == 20
+    # A full bucket lets the first 10 through at once; the other 10 wait ~0.1s each.
+    assert times[-1] - times[0] >= 0.9
+
+
+def test_transient_errors_are_retried(juso_stub):
+    records = _records(2)
+    flaky, slow = (address_lookup_key(r.address_raw) for r in records)
+    juso_stub.errors = {flaky: [503, 503], slow: ["timeout"]}
+    ok, fail, _, _ = _resolve(records, retries=2, timeout_sec=0.3)
+    assert (ok, fail) == (2, 0)
+    assert juso_stub.calls_for(flaky) == 3
+    assert juso_stub.calls_for(slow) == 2
+    assert records[0].address_api.startswith(flaky)
+
+
+def test_permanent_errors_are_not_retried(juso_stub):
+    records = _records(2)
+    rejected, down = (address_lookup_key(r.address_raw) for r in records)
+    juso_stub.errors = {rejected: [400], down: [503, 503, 503]}
+    ok, fail, issues, _ = _resolve(records, retries=2, breaker_threshold=0)
+    assert (ok, fail) == (0, 2)
+    assert juso_stub.calls_for(rejected) == 1
+    assert juso_stub.calls_for(down) == 3
+    assert all(issue["issue"].startswith("API 예외") for issue in issues)
@@ -0,0 +1,15 @@
+﻿import io
+import zipfile
+
+from app.batch import bundle_to_zip, unique_labels
+
+
+def test_unique_labels():
+    assert unique_labels(["4-1", "4-2", "4-1", "4-1 (2)"]) == ["4-1", "4-2", "4-1 (3)", "4-1 (2)"]
+    assert unique_labels(["설문", "설문"]) == ["설문", "설문 (2)"]
+
+
+def test_bundle_keeps_classes_with_the_same_name():
+    results = [{"class": "4-1", "out1": b"a", "out2": b"b", "out3": b"c"} for _ in range(2)]
+    names = zipfile.ZipFile(io.BytesIO(bundle_to_zip(results, 2026))).namelist()
+    assert len(names) == len(set(names)) == 6
@@ -0,0 +1,22 @@
+﻿import os
+
+import pytest
+
+from app.cli import output_labels
+
+
+def test_same_file_name_in_different_folders():
+    files = [os.path.join("district", "a", "설문.xlsx"), os.path.join("district", "b", "설문.xlsx")]
+    labels = output_labels(files)
+    assert labels[files[0]] == os.path.join("a", "설문")
+    assert labels[files[1]] == os.path.join("b", "설문")
+
+
+def test_single_folder_keeps_file_names():
+    files = [os.path.join("school", "4-1.xlsx"), os.path.join("school", "4-2.xlsx")]
+    assert sorted(output_labels(files).values()) == ["4-1", "4-2"]
+
+
+def test_colliding_outputs_are_rejected():
+    with pytest.raises(ValueError):
+        output_labels([os.path.join("a", "설문.xlsx"), os.path.join("a", "설문.XLSX")])
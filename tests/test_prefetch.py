@@ -0,0 +1,24 @@
+﻿from concurrent.futures import Future
+
+from app import prefetch
+
+
+def _seed(key, result):
+    future = Future()
+    future.set_result(result)
+    with prefetch._lock:
+        prefetch._entries[key] = future
+
+
+def test_degraded_results_are_not_reused():
+    for stats in ({"breaker": "open", "skipped": 0}, {"breaker": "closed", "skipped": 3}):
+        _seed("degraded", {"api_stats": stats})
+        assert prefetch.take_prefetch("degraded", b"") == {"api_stats": stats}
+        assert prefetch.prefetch_status("degraded") == "none"
+
+
+def test_complete_results_are_kept():
+    result = {"api_stats": {"breaker": "closed", "skipped": 0}}
+    _seed("complete", result)
+    assert prefetch.take_prefetch("complete", b"") is result
+    assert prefetch.prefetch_status("complete") == "done"
@@ -0,0 +1,34 @@
+﻿import pstats
+import time
+
+from app.profiling import profiled
+from app.timing import StageTimer, span
+
+
+def test_span_peak_is_growth_inside_the_stage():
+    held = [bytearray(1024) for _ in range(2000)]
+    timer = StageTimer()
+    with profiled() as capture:
+        with timer.activate():
+            with span("a"):
+                with span("b"):
+                    buf = bytearray(500 * 1024)
+                    del buf
+    rows = {r["stage"]: r for r in timer.rows()}
+    assert 490 <= rows["a.b"]["peak_kb"] < 1000
+    assert rows["a"]["peak_kb"] >= rows["a.b"]["peak_kb"]
+    assert capture["peak_kb"] >= 500
+    assert len(held) == 2000
+
+
+def test_capture_artifacts(tmp_path):
+    with profiled(top_n=5) as capture:
+        chunks = [bytes(4096) for _ in range(1000)]
+        # Long enough for the peak sampler to see it.
+        time.sleep(0.1)
+        del chunks
+    path = tmp_path / "conversion.pstats"
+    path.write_bytes(capture["pstats"])
+    assert pstats.Stats(str(path)).total_calls > 0
+    assert "test_profiling.py" in capture["allocations"]
+    assert "cumulative" in capture["summary"]